@@ -33,36 +33,16 @@ class AnchorUpdater:
     def update_urbit(self):
         try:
             for patp in self.orchestrator.urbit._urbits:
-                svc_url = None
-                http_port = None
-                http_alias = None
-                ames_port = None
-                s3_port = None
-                console_port = None
-                pub_url = '.'.join(self.config['endpointUrl'].split('.')[1:])
-
-                for ep in self.orchestrator.wireguard.anchor_data['subdomains']:
-                    if ep['status'] == 'ok':
-                        if f'{patp}.{pub_url}' == ep['url']:
-                            svc_url = ep['url']
-                            http_port = ep['port']
-                            http_alias = ep['alias']
-                        elif f'ames.{patp}.{pub_url}' == ep['url']:
-                            ames_port = ep['port']
-                        elif f'bucket.s3.{patp}.{pub_url}' == ep['url']:
-                            s3_port = ep['port']
-                        elif f'console.s3.{patp}.{pub_url}' == ep['url']:
-                            console_port = ep['port']
-
-                if not None in [svc_url,http_port,ames_port,s3_port,console_port, http_alias]:
+                ep = self.orchestrator.wireguard.ship_endpoints(patp)
+                if ep and ep['http_alias'] != None:
                     if not self.orchestrator.urbit.update_wireguard_network(
                             patp,
-                            svc_url,
-                            http_port,
-                            ames_port,
-                            s3_port,
-                            console_port,
-                            http_alias):
+                            ep['url'],
+                            ep['http_port'],
+                            ep['ames_port'],
+                            ep['s3_port'],
+                            ep['console_port'],
+                            ep['http_alias']):
                         raise Exception("Unable to update wireguard network")
             return True
         except Exception as e:
@@ -0,0 +1,209 @@
+# Python
+import os
+import time
+import tarfile
+import zipfile
+from threading import Thread, Lock, Condition, Timer
+
+# Modules
+import zstandard
+
+# Flask
+from flask import Response, request, send_file
+
+# GroundSeg modules
+from log import Log
+
+class ArchiveExport:
+
+    # codec: (extension, mimetype)
+    codecs = {
+            "store": ("zip", "application/zip"),
+            "deflate": ("zip", "application/zip"),
+            "zstd": ("tar.zst", "application/zstd")
+            }
+
+    _chunk_size = 1024 * 1024
+
+    # Seconds a finished archive is kept for resumed downloads
+    keep = 3600
+
+    # path: job, shared by every exporter writing to the exports directory
+    _jobs = {}
+    _lock = Lock()
+
+    def __init__(self, base_path):
+        self.export_dir = f"{base_path}/exports"
+
+    # Stream an archive of src_dir to the client while it is being written to disk
+    def export(self, name, src_dir, codec='deflate', skip=[]):
+        if codec not in self.codecs:
+            Log.log(f"{name}: Unknown export codec {codec}. Using deflate")
+            codec = 'deflate'
+
+        ext, mimetype = self.codecs[codec]
+        file_name = f"{name}.{ext}"
+        path = f"{self.export_dir}/{file_name}"
+
+        # Ranged request for a finished archive, resume the download
+        if request.range and self.is_complete(path):
+            Log.log(f"{name}: Resuming export of {file_name}")
+            return send_file(path, mimetype=mimetype, download_name=file_name,
+                             as_attachment=True, conditional=True)
+
+        # Ranges are only honoured once the archive is finished
+        job = self.build(name, src_dir, path, codec, skip)
+        headers = {"Content-Disposition": f"attachment; filename={file_name}"}
+
+        return Response(self.follow(name, job), mimetype=mimetype, headers=headers)
+
+    def is_complete(self, path):
+        job = ArchiveExport._jobs.get(path)
+        if job:
+            return job['done'] and not job['error'] and os.path.isfile(path)
+        return False
+
+    # Start writing the archive, or join an export that is already running
+    def build(self, name, src_dir, path, codec, skip):
+        with ArchiveExport._lock:
+            job = ArchiveExport._jobs.get(path)
+            if job and not job['done']:
+                Log.log(f"{name}: Export already in progress")
+                return job
+
+            os.makedirs(self.export_dir, exist_ok=True)
+            self._prune(supersede=name)
+
+            open(path, 'wb').close()
+            job = {
+                    "path": path,
+                    "codec": codec,
+                    "written": 0,
+                    "done": False,
+                    "finished": None,
+                    "error": None,
+                    "cond": Condition()
+                    }
+            ArchiveExport._jobs[path] = job
+
+        Thread(target=self._write, args=(name, job, src_dir, skip), daemon=True).start()
+        return job
+
+    # Send archive bytes as soon as they reach the disk
+    def follow(self, name, job):
+        with open(job['path'], 'rb') as f:
+            while True:
+                chunk = f.read(self._chunk_size)
+                if chunk:
+                    yield chunk
+                    continue
+
+                with job['cond']:
+                    if job['done'] and f.tell() >= job['written']:
+                        break
+                    job['cond'].wait(1)
+
+        if job['error']:
+            raise Exception(f"{name}: Export failed: {job['error']}")
+
+    # Delete a pier's or bucket's archives, running or not
+    def remove(self, name):
+        with ArchiveExport._lock:
+            for ext, _ in set(self.codecs.values()):
+                path = f"{self.export_dir}/{name}.{ext}"
+                ArchiveExport._jobs.pop(path, None)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def prune(self):
+        with ArchiveExport._lock:
+            self._prune()
+
+    # Deletes finished archives past keep or replaced by a new export of
+    # the same name, failed ones, and leftovers from earlier runs
+    def _prune(self, supersede=None):
+        now = time.time()
+        try:
+            files = os.listdir(self.export_dir)
+        except FileNotFoundError:
+            return
+
+        replaced = [f"{supersede}.{ext}" for ext, _ in self.codecs.values()]
+        for f in files:
+            path = f"{self.export_dir}/{f}"
+            job = ArchiveExport._jobs.get(path)
+            if job:
+                if not job['done']:
+                    continue
+                if not job['error'] and now - job['finished'] < self.keep and f not in replaced:
+                    continue
+            try:
+                os.remove(path)
+                ArchiveExport._jobs.pop(path, None)
+                Log.log(f"Export: Removed {f}")
+            except Exception as e:
+                Log.log(f"Export: Failed to remove {f}: {e}")
+
+    def _write(self, name, job, src_dir, skip):
+        Log.log(f"{name}: Compressing to {job['path']}")
+        try:
+            with open(job['path'], 'ab', buffering=0) as f:
+                out = _ExportWriter(f, job)
+                if job['codec'] == 'zstd':
+                    cctx = zstandard.ZstdCompressor(threads=-1)
+                    with cctx.stream_writer(out, closefd=False) as zst:
+                        with tarfile.open(fileobj=zst, mode='w|') as tar:
+                            for full, arc in self._walk(name, src_dir, skip):
+                                tar.add(full, arcname=arc, recursive=False)
+                else:
+                    method = zipfile.ZIP_DEFLATED
+                    if job['codec'] == 'store':
+                        method = zipfile.ZIP_STORED
+                    with zipfile.ZipFile(out, 'w', method) as zipf:
+                        for full, arc in self._walk(name, src_dir, skip):
+                            zipf.write(full, arcname=arc)
+
+            Log.log(f"{name}: Export written to {job['path']}")
+
+        except Exception as e:
+            Log.log(f"{name}: Failed to write export: {e}")
+            job['error'] = str(e)
+
+        with job['cond']:
+            job['done'] = True
+            job['finished'] = time.time()
+            job['cond'].notify_all()
+
+        # Nothing else may export for a while, clean up once resuming is over
+        t = Timer(self.keep + 1, self.prune)
+        t.daemon = True
+        t.start()
+
+    def _walk(self, name, src_dir, skip):
+        for root, dirs, files in os.walk(src_dir):
+            for file in files:
+                if file in skip:
+                    Log.log(f"{name}: Skipping {file} while compressing")
+                    continue
+                full = os.path.join(root, file)
+                yield full, os.path.relpath(full, src_dir)
+
+
+# Unseekable writer, zipfile falls back to data descriptors instead of
+# seeking back over headers that were already sent to the client
+class _ExportWriter:
+    def __init__(self, f, job):
+        self.f = f
+        self.job = job
+
+    def write(self, b):
+        n = self.f.write(b)
+        with self.job['cond']:
+            self.job['written'] += n
+            self.job['cond'].notify_all()
+        return n
+
+    def flush(self):
+        pass
@@ -8,6 +8,7 @@ from datetime import datetime, timedelta
 
 # GroundSeg modules
 from log import Log
+from config_store import ConfigStore
 
 class BugReport:
     def submit_report(data, base_path, wg_reg):
@@ -41,8 +42,9 @@ class BugReport:
 
             # Load configs
             try:
+                ConfigStore.flush()
                 cfgs = {}
-                for j in [c for c in os.listdir(f"{base_path}/settings") if c.endswith(".json")]:
+                for j in [c for c in os.listdir(f"{base_path}/settings") if c.endswith(".json") and c != "sessions.json"]:
                     try:
                         with open(f"{base_path}/settings/{j}") as f:
                             cfgs[j] = json.load(f)
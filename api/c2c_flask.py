@@ -198,8 +198,7 @@ class C2C:
     def run(self):
         port = 80
         if self.kill_process(port):
-            Log.log("C2C: Starting Flask server")
-            debug_mode = self.config_object.debug_mode
-            self.app.run(host='0.0.0.0', port=port, threaded=True, debug=debug_mode, use_reloader=False)
+            Log.log("C2C: Starting web server")
+            Utils.serve(self.app, port, self.config_object)
         else:
             Log.log(f"C2C: Port {port} is used! Cannot start Flask server")
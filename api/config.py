@@ -17,6 +17,8 @@ from crontab import CronTab
 
 # GroundSeg Modules
 from log import Log
+from config_store import ConfigStore
+from session_store import SessionStore
 from utils import Utils
 
 class Config:
@@ -25,6 +27,7 @@ class Config:
 
     # System
     _ram = None
+    _ram_avail = None
     _cpu = None
     _core_temp = None
     _disk = None
@@ -84,7 +87,14 @@ class Config:
             "updateUrl": "https://version.groundseg.app",
             "c2cInterval": 0,
             "netCheck": "1.1.1.1:53",
-            "dockerData": "/var/lib/docker"
+            "dockerData": "/var/lib/docker",
+            "startWorkers": 4,
+            "jobWorkers": 4,
+            "meldWorkers": 2,
+            "meldStagger": 120,
+            "webServer": "waitress",
+            "webThreads": 32,
+            "webTimeout": 120
             }
 
     def __init__(self, base_path, debug_mode=False):
@@ -106,6 +116,12 @@ class Config:
         # load existing or create new system.json
         self.config = self.load_config(self.config_file)
 
+        # Login sessions are kept apart from system.json
+        self.sessions = SessionStore(f"{self.base_path}/settings/sessions.json")
+        if len(self.config['sessions']) > 0:
+            self.sessions.migrate(self.config['sessions'])
+            self.config['sessions'] = []
+
         # fix updateMode if set to temp
         if self.config['updateMode'] == 'temp':
             self.config['updateMode'] = 'auto'
@@ -320,11 +336,9 @@ class Config:
 
 
     # Save config
+    # Written shortly after by ConfigStore, bursts of changes share one write
     def save_config(self):
-        with open(self.config_file, 'w') as f:
-            Log.log("Config: Saving system.json")
-            json.dump(self.config, f, indent = 4)
-            return True
+        return ConfigStore.save(self.config_file, self.config)
 
 
     def fixer_script(self):
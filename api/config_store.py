@@ -0,0 +1,164 @@
+# Python
+import os
+import json
+import atexit
+from time import time
+from threading import Thread, Lock, Condition
+
+# GroundSeg modules
+from log import Log
+
+class ConfigStore:
+
+    # path: {"data", "due", "seq", "failures"} waiting to be written
+    _dirty = {}
+    _lock = Lock()
+    _cond = Condition(_lock)
+    _writer = None
+
+    # Bumped by every save and discard, a file only moves to newer data
+    _seq = 0
+
+    # path: seq of the data on disk, or of the discard that removed it
+    _written = {}
+
+    # path: lock held while that file is written
+    _path_locks = {}
+
+    # Seconds changes are held so a burst becomes one write
+    delay = 0.5
+
+    # Seconds before a failed write is tried again, doubled per failure
+    retry = 5
+    retry_max = 300
+
+    # Mark a json file dirty, the latest data object wins
+    def save(path, data):
+        with ConfigStore._cond:
+            ConfigStore._seq += 1
+            entry = ConfigStore._dirty.get(path)
+            if entry:
+                entry['data'] = data
+                entry['seq'] = ConfigStore._seq
+            else:
+                ConfigStore._dirty[path] = {
+                        "data": data,
+                        "due": time() + ConfigStore.delay,
+                        "seq": ConfigStore._seq,
+                        "failures": 0
+                        }
+
+            if ConfigStore._writer == None:
+                ConfigStore._writer = Thread(target=ConfigStore._write_loop, daemon=True)
+                ConfigStore._writer.start()
+                atexit.register(ConfigStore.flush)
+            ConfigStore._cond.notify()
+        return True
+
+    # Pending data for a path if it hasn't been written yet, else what's on disk
+    def load(path):
+        with ConfigStore._lock:
+            entry = ConfigStore._dirty.get(path)
+            if entry:
+                return entry['data']
+
+        with open(path) as f:
+            return json.load(f)
+
+    # Drop pending writes for a file that is being deleted,
+    # returns once a write already in progress has finished
+    def discard(path):
+        with ConfigStore._lock:
+            ConfigStore._dirty.pop(path, None)
+            ConfigStore._seq += 1
+            seq = ConfigStore._seq
+
+        # Data saved before the discard is never written after it
+        with ConfigStore._path_lock(path):
+            ConfigStore._written[path] = seq
+
+    # Write everything pending now
+    def flush():
+        with ConfigStore._lock:
+            pending = list(ConfigStore._dirty.items())
+            ConfigStore._dirty = {}
+
+        for path, entry in pending:
+            ConfigStore._write_entry(path, entry)
+
+    def _write_loop():
+        while True:
+            with ConfigStore._cond:
+                while len(ConfigStore._dirty) < 1:
+                    ConfigStore._cond.wait()
+
+                now = time()
+                due = {p: e for p, e in ConfigStore._dirty.items() if e['due'] <= now}
+                if len(due) < 1:
+                    ConfigStore._cond.wait(min(e['due'] for e in ConfigStore._dirty.values()) - now)
+                    continue
+
+                for path in due:
+                    ConfigStore._dirty.pop(path)
+
+            for path, entry in due.items():
+                ConfigStore._write_entry(path, entry)
+
+    def _path_lock(path):
+        with ConfigStore._lock:
+            return ConfigStore._path_locks.setdefault(path, Lock())
+
+    # One writer per file, skipped if newer data or a discard got there first
+    def _write_entry(path, entry):
+        with ConfigStore._path_lock(path):
+            if ConfigStore._written.get(path, 0) >= entry['seq']:
+                return True
+            if ConfigStore.write(path, entry['data']):
+                ConfigStore._written[path] = entry['seq']
+                return True
+
+        # Failed, queue it again unless it has been replaced or discarded since
+        with ConfigStore._cond:
+            if path in ConfigStore._dirty or ConfigStore._written.get(path, 0) >= entry['seq']:
+                return False
+            entry['failures'] += 1
+            wait = min(ConfigStore.retry * 2 ** (entry['failures'] - 1), ConfigStore.retry_max)
+            entry['due'] = time() + wait
+            ConfigStore._dirty[path] = entry
+            ConfigStore._cond.notify()
+        Log.log(f"Config: Retrying {os.path.basename(path)} in {wait} seconds")
+        return False
+
+    # Temp file, fsync, rename, a crash leaves either the old or the new file
+    def write(path, data):
+        try:
+            # Dumped before touching the disk, a failed dump leaves the file alone
+            for _ in range(3):
+                try:
+                    blob = json.dumps(data, indent=4)
+                    break
+                except RuntimeError:
+                    # Changed size while being dumped, try again
+                    continue
+            else:
+                raise Exception("Config changed while saving")
+
+            tmp = f"{path}.tmp"
+            with open(tmp, 'w') as f:
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+
+            dir_fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+            Log.log(f"Config: Saved {os.path.basename(path)}")
+            return True
+
+        except Exception as e:
+            Log.log(f"Config: Failed to save {path}: {e}")
+            return False
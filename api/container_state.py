@@ -0,0 +1,202 @@
+# Python
+from time import sleep
+from threading import Lock
+
+# Modules
+import docker
+
+# GroundSeg modules
+from log import Log
+
+client = docker.from_env()
+
+class ContainerState:
+
+    # name: {"id", "status", "image"}
+    _states = {}
+    _lock = Lock()
+    _ready = False
+
+    # Bumped by every event, name: _seq of its last event
+    _seq = 0
+    _touched = {}
+
+    # callback(name, status) for every container state change
+    _listeners = []
+
+    # container event: status it leaves the container in
+    _actions = {
+            "create": "created",
+            "start": "running",
+            "restart": "running",
+            "unpause": "running",
+            "pause": "paused",
+            "die": "exited",
+            "stop": "exited"
+            }
+
+    # Seconds between full reconciliations with the daemon
+    reconcile_interval = 30
+
+    # Follow the docker events stream and keep the index up to date
+    def event_loop():
+        Log.log("Containers: Event listener thread started")
+        error_time = 5
+        while True:
+            try:
+                # Subscribed before listing, events in between are buffered
+                events = client.events(decode=True, filters={"type": "container"})
+                ContainerState.reconcile()
+                error_time = 5
+                for e in events:
+                    ContainerState.apply_event(e)
+
+            except Exception as e:
+                Log.log(f"Containers: Event stream error: {e}")
+                Log.log(f"Containers: Reconnecting in {error_time} seconds")
+                sleep(error_time)
+                error_time = min(error_time * 2, 60)
+
+    # Periodically rebuild the index in case an event was missed
+    def reconcile_loop():
+        Log.log("Containers: Reconciliation thread started")
+        while True:
+            sleep(ContainerState.reconcile_interval)
+            try:
+                ContainerState.reconcile()
+            except Exception as e:
+                Log.log(f"Containers: Reconciliation failed: {e}")
+
+    # One containers list call for every container on the system
+    def reconcile():
+        with ContainerState._lock:
+            start = ContainerState._seq
+
+        listed = {}
+        for c in client.api.containers(all=True):
+            for name in c['Names']:
+                listed[name.lstrip('/')] = {
+                        "id": c['Id'],
+                        "status": c['State'],
+                        "image": c['Image']
+                        }
+
+        with ContainerState._lock:
+            old = ContainerState._states
+            touched = ContainerState._touched
+
+            # Containers with events since the list was taken keep the event's state
+            states = {}
+            for n in set(listed) | set(old):
+                state = old.get(n) if touched.get(n, 0) > start else listed.get(n)
+                if state:
+                    states[n] = state
+
+            ContainerState._states = states
+            ContainerState._touched = {n: seq for n, seq in touched.items() if seq > start}
+            ContainerState._ready = True
+
+        changed = [(n, None) for n in old if n not in states]
+        for n, state in states.items():
+            if n not in old or old[n]['status'] != state['status']:
+                changed.append((n, state['status']))
+        ContainerState.notify(changed)
+
+    def apply_event(e):
+        action = e.get('Action', e.get('status', ''))
+        attrs = e.get('Actor', {}).get('Attributes', {})
+        name = attrs.get('name')
+        if not name:
+            return
+
+        changed = []
+        with ContainerState._lock:
+            if action == 'destroy':
+                ContainerState._states.pop(name, None)
+                ContainerState._touch(name)
+                changed.append((name, None))
+
+            elif action.startswith('rename'):
+                old = attrs.get('oldName', '').lstrip('/')
+                state = ContainerState._states.pop(old, None)
+                ContainerState._touch(old)
+                ContainerState._touch(name)
+                if state:
+                    ContainerState._states[name] = state
+                    changed = [(old, None), (name, state['status'])]
+
+            else:
+                status = ContainerState._actions.get(action)
+                if status:
+                    ContainerState._set(name, status, e.get('id', ''), attrs.get('image', ''))
+                    changed.append((name, status))
+
+        ContainerState.notify(changed)
+
+    # Record a start or stop right away instead of waiting for its event
+    def set_status(name, status):
+        with ContainerState._lock:
+            old = ContainerState._states.get(name)
+            if old and old['status'] == status:
+                return
+            ContainerState._set(name, status)
+        ContainerState.notify([(name, status)])
+
+    def _set(name, status, cid='', image=''):
+        state = ContainerState._states.setdefault(name, {
+            "id": cid,
+            "status": status,
+            "image": image
+            })
+        state['status'] = status
+        ContainerState._touch(name)
+
+    def _touch(name):
+        ContainerState._seq += 1
+        ContainerState._touched[name] = ContainerState._seq
+
+    # Register a callback(name, status), status is None once removed
+    def subscribe(callback):
+        ContainerState._listeners.append(callback)
+
+    def notify(changed):
+        for name, status in changed:
+            for callback in ContainerState._listeners:
+                try:
+                    callback(name, status)
+                except Exception as e:
+                    Log.log(f"Containers: State listener failed for {name}: {e}")
+
+    # Status of a container, None if it doesn't exist
+    def status(name):
+        if not ContainerState.ensure_ready():
+            return None
+
+        state = ContainerState._states.get(name)
+        if state:
+            return state['status']
+        return None
+
+    def exists(name):
+        return ContainerState.status(name) != None
+
+    def is_running(name):
+        return ContainerState.status(name) == "running"
+
+    # Names of all running containers
+    def running():
+        if not ContainerState.ensure_ready():
+            return []
+
+        with ContainerState._lock:
+            return [n for n, s in ContainerState._states.items() if s['status'] == "running"]
+
+    # Index is filled lazily if the event thread hasn't started yet
+    def ensure_ready():
+        if not ContainerState._ready:
+            try:
+                ContainerState.reconcile()
+            except Exception as e:
+                Log.log(f"Containers: Unable to read container states: {e}")
+
+        return ContainerState._ready
@@ -0,0 +1,206 @@
+# Python
+import json
+from time import time
+from datetime import date
+from queue import Queue, Empty, Full
+from threading import Thread, Lock, Event
+
+# Modules
+from werkzeug.http import http_date
+
+# GroundSeg modules
+from log import Log
+from container_state import ContainerState
+from system_get import SysGet
+
+# Pushes state to the web UI, each open stream holds a web thread
+class EventHub:
+
+    # Share of the web threads open streams may hold, the rest serve the REST routes
+    stream_share = 4
+
+    # Seconds between state checks while anyone is listening
+    interval = 1
+
+    # Seconds between keepalive comments on an idle stream
+    keepalive = 15
+
+    # Events a slow client may fall behind by before it is dropped
+    backlog = 256
+
+    # Seconds between nmcli probes, too slow to run every interval
+    probe_interval = 30
+
+    # Ship info keys that change on every read, left out of the diff
+    volatile = ["timeNow"]
+
+    def __init__(self, orchestrator):
+        self.orchestrator = orchestrator
+        self._clients = []
+        self._streams = 0
+        self._lock = Lock()
+        self._wake = Event()
+        self._thread = None
+
+        # topic: last state sent, keyed for diffing
+        self._state = {}
+
+        # Last nmcli probe results and when they were read
+        self._probe_state = {}
+        self._probed = 0
+
+        ContainerState.subscribe(self.container_changed)
+
+    # Most streams open at once, /events and /events/logs together
+    def max_streams(self):
+        return max(1, int(self.orchestrator.config['webThreads']) // self.stream_share)
+
+    # Takes a stream slot, False when all of them are held
+    def _reserve(self):
+        if self._streams >= self.max_streams():
+            return False
+        self._streams += 1
+        return True
+
+    # Server-sent event stream for one client, starts with the full state
+    # None when too many streams are open
+    def stream(self):
+        q = Queue(maxsize=self.backlog)
+        with self._lock:
+            if not self._reserve():
+                Log.log("Events: Stream limit reached, refusing client")
+                return None
+            self._clients.append(q)
+            for topic, state in self._state.items():
+                q.put_nowait((topic, {"set": state, "unset": []}))
+            if not self._thread or not self._thread.is_alive():
+                self._thread = Thread(target=self._watch, daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return self._events(q)
+
+    def _events(self, q):
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    item = q.get(timeout=self.keepalive)
+                except Empty:
+                    yield ": keepalive\n\n"
+                    continue
+
+                if item == None:
+                    return
+                topic, diff = item
+                yield f"event: {topic}\ndata: {self._dumps(diff)}\n\n"
+
+        finally:
+            with self._lock:
+                self._streams -= 1
+                if q in self._clients:
+                    self._clients.remove(q)
+
+    # Log lines for one viewer as they are written, None when too many streams are open
+    def log_stream(self, container, line):
+        with self._lock:
+            if not self._reserve():
+                Log.log("Events: Stream limit reached, refusing log viewer")
+                return None
+        return self._log_events(container, line)
+
+    def _log_events(self, container, line):
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                lines = self.orchestrator.tail_log_lines(container, line)
+                if len(lines) > 0:
+                    line += len(lines)
+                    yield f"event: logs\ndata: {json.dumps({'container': container, 'haveLine': line, 'lines': lines})}\n\n"
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            with self._lock:
+                self._streams -= 1
+
+    def container_changed(self, name, status):
+        self._wake.set()
+
+    # Checks state only while clients are connected, wakes early on container events
+    def _watch(self):
+        Log.log("Events: Push thread started")
+        while True:
+            with self._lock:
+                if len(self._clients) < 1:
+                    self._state = {}
+                    self._thread = None
+                    Log.log("Events: No clients, push thread stopped")
+                    return
+
+            for topic, read in self._topics().items():
+                try:
+                    self._publish(topic, read())
+                except Exception as e:
+                    Log.log(f"Events: Failed to read {topic}: {e}")
+
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _topics(self):
+        o = self.orchestrator
+        return {
+                "urbits": lambda: {u['name']: u for u in o.get_urbits()},
+                "urbit": lambda: {p: self._stable(o.get_urbit(p)) for p in o.config['piers']},
+                "system": lambda: {**o.get_system_settings(probes=False)['system'], **self._probes()},
+                "anchor": lambda: o.get_anchor_settings()['anchor'],
+                "upload": lambda: {p: o.upload_status({'patp': p, 'action': 'status'})
+                                   for p in list(o.config_object.upload_status)}
+                }
+
+    def _stable(self, info):
+        return {k: v for k, v in info.items() if k not in self.volatile}
+
+    def _probes(self):
+        if "vm" == self.orchestrator.config_object.device_mode:
+            return {}
+
+        if time() - self._probed > self.probe_interval:
+            self._probe_state = {
+                    "connected": SysGet.get_connection_status(),
+                    "ethOnly": SysGet.get_ethernet_status()
+                    }
+            self._probed = time()
+
+        return self._probe_state
+
+    # Send the keys that changed since the last check
+    def _publish(self, topic, state):
+        # Compare through json so datetimes and tuples match what was sent
+        state = json.loads(self._dumps(state))
+        old = self._state.get(topic, {})
+        diff = {
+                "set": {k: v for k, v in state.items() if old.get(k) != v},
+                "unset": [k for k in old if k not in state]
+                }
+        # An empty first state is still sent, clients wait for every topic
+        if topic in self._state and len(diff['set']) < 1 and len(diff['unset']) < 1:
+            return
+
+        with self._lock:
+            self._state[topic] = state
+            for q in list(self._clients):
+                try:
+                    q.put_nowait((topic, diff))
+                except Full:
+                    # Too far behind, it reconnects and gets the full state
+                    self._clients.remove(q)
+                    with q.mutex:
+                        q.queue.clear()
+                    q.put_nowait(None)
+
+    # Dates as Flask's jsonify writes them, the UI slices that format
+    def _dumps(self, value):
+        def default(o):
+            if isinstance(o, date):
+                return http_date(o)
+            return str(o)
+        return json.dumps(value, default=default)
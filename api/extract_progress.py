@@ -0,0 +1,34 @@
+# Python
+import time
+from threading import Lock
+
+class ExtractProgress:
+
+    # Updated by the extraction workers, read by the progress endpoint
+    def __init__(self, total):
+        self.total = total
+        self.current = 0
+        self.files = 0
+        self.started = time.time()
+        self._lock = Lock()
+
+    def add(self, nbytes, files=0):
+        with self._lock:
+            self.current += nbytes
+            self.files += files
+
+    def snapshot(self):
+        current = self.current
+        elapsed = max(time.time() - self.started, 0.001)
+        rate = current / elapsed
+        eta = None
+        if rate > 0:
+            eta = int(max(self.total - current, 0) / rate)
+
+        return {
+                "current": current,
+                "total": self.total,
+                "files": self.files,
+                "rate": int(rate),
+                "eta": eta
+                }
@@ -4,6 +4,10 @@ try:
 except:
     dev = False
 
+# Python
+import os
+import signal
+
 # GroundSeg modules
 from config import Config
 from log import Log
@@ -24,6 +28,18 @@ from anchor_information import AnchorUpdater
 from wireguard_refresher import WireguardRefresher
 from kill_switch import KillSwitch
 from keygen import KeyGen
+from container_state import ContainerState
+from config_store import ConfigStore
+
+# systemd stops GroundSeg with SIGTERM, which skips atexit.
+# Write out what is still queued, then exit without waiting on worker threads
+def shutdown(signum, frame):
+    Log.log("GroundSeg: Received SIGTERM, shutting down")
+    ConfigStore.flush()
+    Log.flush()
+    os._exit(0)
+
+signal.signal(signal.SIGTERM, shutdown)
 
 # Setup System Config
 base_path = "/opt/nativeplanet/groundseg"
@@ -51,6 +67,10 @@ else:
     Thread(target=sys_mon.temp_monitor, daemon=True).start()
     Thread(target=sys_mon.disk_monitor, daemon=True).start()
 
+    # Container state index
+    Thread(target=ContainerState.event_loop, daemon=True).start()
+    Thread(target=ContainerState.reconcile_loop, daemon=True).start()
+
     # Start Key Generator
     gen = KeyGen(sys_config)
     Thread(target=gen.generator_loop, daemon=True).start()
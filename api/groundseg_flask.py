@@ -1,10 +1,11 @@
 # Flask
-from flask import Flask, jsonify, request, make_response
+from flask import Flask, Response, jsonify, request, make_response
 from flask_cors import CORS
 
 # GroundSeg modules
 from log import Log
 from utils import Utils
+from event_hub import EventHub
 
 # Create flask app
 class GroundSeg:
@@ -12,6 +13,7 @@ class GroundSeg:
         self.config_object = config
         self.config = config.config
         self.orchestrator = orchestrator
+        self.events = EventHub(orchestrator)
 
         self.app = Flask(__name__)
         CORS(self.app, supports_credentials=True)
@@ -58,6 +60,39 @@ class GroundSeg:
 
             return message
 
+        # Download pier or bucket archive
+        @self.app.route('/urbit/export', methods=['GET', 'HEAD'])
+        def urbit_export():
+            approved, message = self.verify(request)
+
+            # Checked before the download starts, without building anything
+            if request.method == 'HEAD':
+                ok = approved and self.orchestrator.export_available(request.args.get('urbit_id'),
+                                                                     request.args.get('app', 'pier'),
+                                                                     request.args.get('codec', 'deflate'))
+                return make_response('', 200 if ok else 404)
+
+            if approved:
+                urbit_id = request.args.get('urbit_id')
+                app = request.args.get('app', 'pier')
+                codec = request.args.get('codec', 'deflate')
+                res = self.orchestrator.urbit_export(urbit_id, app, codec)
+                return self.custom_jsonify(res)
+
+            return message
+
+        # Background ship operations
+        @self.app.route('/jobs', methods=['GET'])
+        def jobs():
+            approved, message = self.verify(request)
+
+            if approved:
+                job_id = request.args.get('id')
+                urbit_id = request.args.get('urbit_id')
+                res = self.orchestrator.get_jobs(job_id, urbit_id)
+                return jsonify(res)
+
+            return message
 
         # Handle device's system settings
         @self.app.route("/system", methods=['GET','POST'])
@@ -123,13 +158,41 @@ class GroundSeg:
 
             return message
 
+        # Push ship, system, anchor and upload state as it changes
+        @self.app.route("/events", methods=['GET'])
+        def events():
+            approved, message = self.verify(request)
+
+            if approved:
+                return self.event_response(self.events.stream())
+
+            return message
+
+        # Push new log lines of a container
+        @self.app.route("/events/logs", methods=['GET'])
+        def log_events():
+            approved, message = self.verify(request)
+
+            if approved:
+                container = request.args.get('container')
+                try:
+                    line = int(request.args.get('haveLine', 0))
+                except (TypeError, ValueError):
+                    return make_response(jsonify(400), 400)
+
+                return self.event_response(self.events.log_stream(container, line))
+
+            return message
+
         # Login
         @self.app.route("/login", methods=['POST'])
         def login():
             if self.orchestrator.config['firstBoot']:
                 return jsonify('setup')
 
-            return self.orchestrator.handle_login_request(request.get_json())
+            return self.orchestrator.handle_login_request(request.get_json(),
+                                                          request.headers.get('User-Agent', ''),
+                                                          request.remote_addr)
 
         # Request for pubkey
         @self.app.route("/login/key", methods=['GET'])
@@ -169,7 +232,7 @@ class GroundSeg:
             sessionid = req.cookies.get('sessionid')
 
         # Verified session
-        if sessionid in self.config['sessions']:
+        if self.config_object.sessions.verify(sessionid):
             return (True, None)
 
         # No session ID provided
@@ -183,8 +246,18 @@ class GroundSeg:
             return jsonify(val)
         return val
 
+    # Server-sent event response, proxies must not buffer it
+    # 503 when the event hub is out of stream slots
+    def event_response(self, stream):
+        if stream == None:
+            return make_response(jsonify(503), 503)
+
+        res = Response(stream, mimetype='text/event-stream')
+        res.headers['Cache-Control'] = 'no-cache'
+        res.headers['X-Accel-Buffering'] = 'no'
+        return res
+
     # Run Flask app
     def run(self):
-        Log.log("GroundSeg: Starting Flask server")
-        debug_mode = self.config_object.debug_mode
-        self.app.run(host='0.0.0.0', port=27016, threaded=True, debug=debug_mode, use_reloader=False)
+        Log.log("GroundSeg: Starting web server")
+        Utils.serve(self.app, 27016, self.config_object)
@@ -0,0 +1,88 @@
+# Python
+import time
+import requests
+from collections import deque
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+# GroundSeg modules
+from log import Log
+
+class HealthProbe:
+
+    # Probes kept per ship
+    history_size = 30
+
+    def __init__(self, workers=16, timeout=(3, 5)):
+        self.timeout = timeout
+        self._lock = Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="probe")
+
+        # One keep-alive connection per ship instead of a handshake per probe
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # patp: deque of {"time", "status", "latency"}
+        self.history = {}
+
+    # Probes every (patp, url) at once, returns patp: status
+    # status is the HTTP code, or None if there was no answer
+    def probe_all(self, targets):
+        futures = {p: self._pool.submit(self.probe, p, url) for p, url in targets}
+        return {p: f.result() for p, f in futures.items()}
+
+    def probe(self, patp, url):
+        start = time.monotonic()
+        try:
+            res = self.session.get(url, timeout=self.timeout)
+            status = res.status_code
+            res.close()
+        except requests.exceptions.RequestException as e:
+            Log.log(f"WG Refresher: Probe of {patp} failed: {e}")
+            status = None
+
+        self.record(patp, status, time.monotonic() - start)
+        return status
+
+    def record(self, patp, status, latency):
+        with self._lock:
+            h = self.history.get(patp)
+            if h == None:
+                h = self.history[patp] = deque(maxlen=self.history_size)
+            h.append({"time": time.time(), "status": status, "latency": round(latency, 3)})
+
+    # Consecutive probes of a ship since a time that came back with the status
+    def streak(self, patp, status, since=0):
+        n = 0
+        with self._lock:
+            for entry in reversed(self.history.get(patp, ())):
+                if entry['status'] != status or entry['time'] < since:
+                    break
+                n += 1
+        return n
+
+    # Health summary of every probed ship
+    def summary(self):
+        with self._lock:
+            out = {}
+            for p, h in self.history.items():
+                lat = sorted(e['latency'] for e in h)
+                ok = sum(1 for e in h if e['status'] == 200)
+                out[p] = {
+                        "last": h[-1]['status'],
+                        "checked": h[-1]['time'],
+                        "healthy": round(ok / len(h), 3),
+                        "latency_p50": lat[len(lat) // 2],
+                        "latency_max": lat[-1]
+                        }
+            return out
+
+    # Drop ships that are no longer probed
+    def forget(self, keep):
+        with self._lock:
+            for p in list(self.history):
+                if p not in keep:
+                    self.history.pop(p)
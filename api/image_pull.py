@@ -0,0 +1,36 @@
+# Python
+import time
+from threading import Lock
+
+# GroundSeg modules
+from log import Log
+
+class ImagePull:
+
+    _guard = Lock()
+
+    # image: lock held while it is being pulled
+    _locks = {}
+
+    # image: when its last pull finished
+    _pulled = {}
+
+    # Containers starting together share one pull of the same image,
+    # a pull that is requested later always goes to the registry
+    def pull(client, image, name):
+        requested = time.monotonic()
+        with ImagePull._guard:
+            lock = ImagePull._locks.setdefault(image, Lock())
+
+        with lock:
+            if ImagePull._pulled.get(image, 0) >= requested:
+                Log.log(f"{name}: {image} was pulled while waiting")
+                return True
+            try:
+                Log.log(f"{name}: Pulling {image}")
+                client.images.pull(image)
+                ImagePull._pulled[image] = time.monotonic()
+                return True
+            except Exception as e:
+                Log.log(f"{name}: Failed to pull {image}: {e}")
+                return False
@@ -0,0 +1,101 @@
+# Python
+import time
+import secrets
+from collections import deque
+from threading import Lock, Event
+from concurrent.futures import ThreadPoolExecutor
+
+# GroundSeg modules
+from log import Log
+
+class JobQueue:
+
+    # Seconds a finished job stays queryable
+    keep = 3600
+
+    def __init__(self, workers=4):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = Lock()
+
+        # id: job
+        self._jobs = {}
+
+        # key: job ids waiting behind the running one
+        self._pending = {}
+
+    # Queue fn(*args) behind every earlier job with the same key, returns the job id
+    def submit(self, key, action, fn, *args):
+        job = {
+                "id": secrets.token_hex(8),
+                "key": key,
+                "action": action,
+                "status": "queued",
+                "result": None,
+                "created": time.time(),
+                "started": None,
+                "finished": None,
+                "fn": fn,
+                "args": args,
+                "done": Event()
+                }
+
+        with self._lock:
+            self._prune()
+            self._jobs[job['id']] = job
+            q = self._pending.get(key)
+            if q != None:
+                q.append(job['id'])
+                return job['id']
+            self._pending[key] = deque()
+
+        Log.log(f"Jobs: {key} {action} queued as {job['id']}")
+        self._pool.submit(self._run, job)
+        return job['id']
+
+    # Block until a job finishes, returns its result
+    def wait(self, job_id, timeout=None):
+        job = self._jobs.get(job_id)
+        if not job:
+            return 400
+        job['done'].wait(timeout)
+        return job['result']
+
+    # Public view of one job, or all jobs of a key
+    def status(self, job_id=None, key=None):
+        with self._lock:
+            if job_id:
+                job = self._jobs.get(job_id)
+                return self._view(job) if job else None
+            return [self._view(j) for j in self._jobs.values() if key == None or j['key'] == key]
+
+    def _view(self, job):
+        return {k: v for k, v in job.items() if k not in ('fn', 'args', 'done')}
+
+    def _run(self, job):
+        job['status'] = "running"
+        job['started'] = time.time()
+        try:
+            job['result'] = job['fn'](*job['args'])
+            job['status'] = "done"
+        except Exception as e:
+            Log.log(f"Jobs: {job['key']} {job['action']} failed: {e}")
+            job['result'] = 400
+            job['status'] = "failed"
+
+        job['finished'] = time.time()
+        job['done'].set()
+        Log.log(f"Jobs: {job['key']} {job['action']} {job['status']} in {job['finished'] - job['started']:.1f}s")
+
+        # Next job for the same key, jobs for other keys run alongside
+        with self._lock:
+            q = self._pending[job['key']]
+            if len(q) < 1:
+                self._pending.pop(job['key'])
+                return
+            nxt = self._jobs[q.popleft()]
+        self._pool.submit(self._run, nxt)
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [i for i, j in self._jobs.items() if j['finished'] and now - j['finished'] > self.keep]:
+            self._jobs.pop(job_id)
@@ -0,0 +1,173 @@
+# Python
+import os
+import json
+from uuid import uuid4
+from queue import Queue, Empty
+from threading import Thread, Lock, Event
+
+# GroundSeg modules
+from log import Log
+
+class LensClient:
+
+    # Written by curl after each response body
+    _marker = "__lens_status__"
+
+    # Seconds an idle ship worker waits before exiting
+    _idle = 60
+
+    # The pier volume's mount point inside the ship container
+    _mount = "/urbit"
+
+    # Seconds a pack or meld may take, long but a hung ship is still given up on
+    long_timeout = 4 * 60 * 60
+
+    def __init__(self, urb_docker, volume_dir, timeout=60):
+        self.urb_docker = urb_docker
+        self.volume_dir = volume_dir
+        self.timeout = timeout
+        self._queues = {}
+        self._lock = Lock()
+
+    # Send one dojo command, returns (success, output)
+    def command(self, patp, lens_addr, source, sink, timeout=None):
+        return self.batch(patp, lens_addr, [{"source": source, "sink": sink}], timeout)[0]
+
+    # Send several lens payloads, they share the ship's queue and connection
+    # timeout is per payload
+    def batch(self, patp, lens_addr, payloads, timeout=None):
+        if timeout == None:
+            timeout = self.timeout
+        if not lens_addr:
+            Log.log(f"{patp}: No loopback address for lens")
+            return [(False, '')] * len(payloads)
+
+        job = {
+                "addr": lens_addr,
+                "payloads": payloads,
+                "timeout": timeout,
+                "results": None,
+                "cancelled": False,
+                "limit": None,
+                "started": Event(),
+                "done": Event()
+                }
+
+        with self._lock:
+            q = self._queues.get(patp)
+            if not q:
+                q = Queue()
+                self._queues[patp] = q
+                Thread(target=self._worker, args=(patp, q), daemon=True).start()
+            q.put(job)
+
+        # Jobs queued ahead of this one get their own timeout's worth
+        queue_wait = timeout * 2 + 5
+        if not job['started'].wait(queue_wait):
+            with self._lock:
+                if not job['started'].is_set():
+                    job['cancelled'] = True
+                    Log.log(f"{patp}: Lens request timed out in the queue")
+                    return [(False, '')] * len(payloads)
+
+        # Then as long as the whole exec it went out in may take
+        if not job['done'].wait(job['limit']):
+            Log.log(f"{patp}: Lens request timed out")
+            return [(False, '')] * len(payloads)
+
+        return job['results']
+
+    # Drain the ship's queue, every waiting job goes out in a single exec
+    def _worker(self, patp, q):
+        while True:
+            try:
+                jobs = [q.get(timeout=self._idle)]
+            except Empty:
+                with self._lock:
+                    if q.empty():
+                        self._queues.pop(patp, None)
+                        return
+                continue
+
+            while True:
+                try:
+                    jobs.append(q.get_nowait())
+                except Empty:
+                    break
+
+            # Every payload gets its curl --max-time, the exec takes at most their sum
+            limit = 5
+            with self._lock:
+                jobs = [j for j in jobs if not j['cancelled']]
+                for j in jobs:
+                    limit += j['timeout'] * len(j['payloads'])
+                for j in jobs:
+                    j['limit'] = limit
+                    j['started'].set()
+
+            if len(jobs) < 1:
+                continue
+
+            payloads = [(p, j['timeout']) for j in jobs for p in j['payloads']]
+            try:
+                results = self._send(patp, jobs[-1]['addr'], payloads)
+            except Exception as e:
+                Log.log(f"{patp}: Lens request failed: {e}")
+                results = [(False, '')] * len(payloads)
+
+            i = 0
+            for j in jobs:
+                n = len(j['payloads'])
+                j['results'] = results[i:i + n]
+                i += n
+                j['done'].set()
+
+    # One curl process, requests chained with --next reuse the connection
+    def _send(self, patp, lens_addr, payloads):
+        # Bodies can carry credentials, keep them out of ps and the logs.
+        # Written through the host side of the pier volume, so the exec is the only docker call
+        host_dir = f"{self.volume_dir}/{patp}/_data"
+        prefix = f"lens_{uuid4().hex}"
+        names = [f"{prefix}_{i}.json" for i in range(len(payloads))]
+
+        command = ['curl']
+        results = []
+        written = []
+        try:
+            for name, (p, _) in zip(names, payloads):
+                fd = os.open(f"{host_dir}/{name}", os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                written.append(name)
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(p, f)
+
+            for i, (p, timeout) in enumerate(payloads):
+                if i > 0:
+                    command.append('--next')
+                command += ['-s', '--max-time', str(timeout),
+                            '-X', 'POST',
+                            '-H', 'Content-Type: application/json',
+                            '-d', f"@{self._mount}/{names[i]}",
+                            '-w', f"\n{self._marker}%{{http_code}}\n",
+                            lens_addr]
+
+            res = self.urb_docker.exec(patp, command)
+
+        finally:
+            for name in written:
+                try:
+                    os.remove(f"{host_dir}/{name}")
+                except Exception as e:
+                    Log.log(f"{patp}: Unable to remove {name}: {e}")
+
+        if res:
+            parts = res.output.decode('utf-8').split(f"\n{self._marker}")
+            body = parts[0]
+            for part in parts[1:]:
+                code, _, rest = part.partition('\n')
+                results.append((code.strip() == '200', body))
+                body = rest
+
+        while len(results) < len(payloads):
+            results.append((False, ''))
+
+        return results
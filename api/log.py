@@ -1,40 +1,176 @@
 import os
 import sys
+import atexit
 import shutil
+from array import array
+from queue import SimpleQueue, Empty
+from threading import Thread, Lock, Event, Condition
 from datetime import datetime
 
 class Log:
 
+    _log_dir = "/opt/nativeplanet/groundseg/logs"
+    _legacy_log = "/opt/nativeplanet/groundseg/groundseg.log"
+
+    # (timestamp, text) waiting for the writer thread
+    _queue = SimpleQueue()
+    _writer = None
+    _start_lock = Lock()
+
+    # Lines written per flush at most
+    _batch = 512
+
+    # Lines kept for the next try while the log file can't be written
+    _pending_max = 10000
+
+    # Byte offset where each line of the indexed logfile starts
+    _index_path = None
+    _index = array('q', [0])
+    _index_lock = Lock()
+
+    # Notified after every batch the writer flushes
+    _written = Condition()
+    _batches = 0
+
     # Log to file
     def log(text):
-        print(text, file=sys.stderr)
-        try:
-            # make directory if doesn't exist
-            os.makedirs("/opt/nativeplanet/groundseg/logs", exist_ok=True)
-
-            # current log file
-            current_logfile = f"{datetime.now().strftime('%Y-%m')}.log"
-
-            # move legacy logfile to new directory
-            if os.path.isfile(f"/opt/nativeplanet/groundseg/groundseg.log"):
-                shutil.move("/opt/nativeplanet/groundseg/groundseg.log",
-                            f"/opt/nativeplanet/groundseg/logs/{current_logfile}")
-
-            # write to logfile
-            with open(f"/opt/nativeplanet/groundseg/logs/{current_logfile}", "a") as log:
-                log.write(f"{datetime.now()} {text}\n")
-                log.close()
-        except:
-            pass
-
-    # Get GroundSeg logs
-    def get_log():
+        Log._queue.put((datetime.now(), text))
+        if Log._writer == None:
+            Log._start_writer()
+
+    def _start_writer():
+        with Log._start_lock:
+            if Log._writer == None:
+                Log._writer = Thread(target=Log._write_loop, daemon=True)
+                Log._writer.start()
+                atexit.register(Log.flush)
+
+    # Single writer, the log file stays open until the month changes
+    def _write_loop():
+        month = None
+        logfile = None
+        pending = []
+        while True:
+            batch = [Log._queue.get()]
+            while len(batch) < Log._batch:
+                try:
+                    batch.append(Log._queue.get_nowait())
+                except Empty:
+                    break
+
+            for item in batch:
+                if isinstance(item, Event):
+                    continue
+                now, text = item
+                print(text, file=sys.stderr)
+                pending.append(f"{now} {text}\n")
+
+            try:
+                current = datetime.now().strftime('%Y-%m')
+                if current != month:
+                    if logfile:
+                        logfile.close()
+                    logfile = Log._open(current)
+                    month = current
+
+                logfile.write(''.join(pending))
+                logfile.flush()
+                pending = []
+            except Exception as e:
+                print(f"Log: Failed to write log file: {e}", file=sys.stderr)
+
+                # Reopened for the next batch, which retries these lines too
+                try:
+                    if logfile:
+                        logfile.close()
+                except Exception:
+                    pass
+                logfile = None
+                month = None
+                if len(pending) > Log._pending_max:
+                    pending = pending[-Log._pending_max:]
+
+            # Wake anyone waiting on a flush once their lines are out
+            for item in batch:
+                if isinstance(item, Event):
+                    item.set()
+
+            with Log._written:
+                Log._batches += 1
+                Log._written.notify_all()
+
+    def _open(month):
+        # make directory if doesn't exist
+        os.makedirs(Log._log_dir, exist_ok=True)
+
         # current log file
-        current_logfile = f"{datetime.now().strftime('%Y-%m')}.log"
+        current_logfile = f"{Log._log_dir}/{month}.log"
+
+        # move legacy logfile to new directory
+        if os.path.isfile(Log._legacy_log):
+            shutil.move(Log._legacy_log, current_logfile)
+
+        return open(current_logfile, "a")
+
+    # Block until everything logged so far is written
+    def flush(timeout=5):
+        if Log._writer == None:
+            return
+        done = Event()
+        Log._queue.put(done)
+        done.wait(timeout)
+
+    # Get GroundSeg logs from line start onwards
+    def get_log(start=0):
+        path = f"{Log._log_dir}/{datetime.now().strftime('%Y-%m')}.log"
+        with Log._index_lock:
+            Log._update_index(path)
+            count = len(Log._index) - 1
+            if start >= count:
+                return []
+
+            # Seek to the first wanted line, read through the last complete one
+            begin = Log._index[start]
+            with open(path, 'rb') as f:
+                f.seek(begin)
+                data = f.read(Log._index[count] - begin)
+
+        return data.decode('utf-8', errors='replace').split('\n')[:-1]
+
+    # Long poll for lines after start, empty if none arrive in time
+    def tail_log(start=0, timeout=25):
+        with Log._written:
+            batches = Log._batches
+
+        lines = Log.get_log(start)
+        if len(lines) < 1:
+            with Log._written:
+                Log._written.wait_for(lambda: Log._batches != batches, timeout)
+            lines = Log.get_log(start)
+        return lines
+
+    # Index whatever was appended since the last read
+    def _update_index(path):
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            size = 0
+
+        # New month or truncated file
+        if path != Log._index_path or size < Log._index[-1]:
+            Log._index_path = path
+            Log._index = array('q', [0])
 
-        # read log
-        with open(f"/opt/nativeplanet/groundseg/logs/{current_logfile}") as f:
-            log = f.read()
-            f.close()
+        indexed = Log._index[-1]
+        if size <= indexed:
+            return
 
-        return log.split("\n")
+        with open(path, 'rb') as f:
+            f.seek(indexed)
+            offset = indexed
+            while chunk := f.read(1024 * 1024):
+                pos = chunk.find(b'\n')
+                while pos != -1:
+                    Log._index.append(offset + pos + 1)
+                    pos = chunk.find(b'\n', pos + 1)
+                offset += len(chunk)
@@ -0,0 +1,175 @@
+# Python
+from time import time
+from collections import deque
+from threading import Thread, Lock, Condition, Event
+from datetime import datetime, timezone
+
+# Modules
+import docker
+
+# GroundSeg modules
+from log import Log
+from container_state import ContainerState
+
+client = docker.from_env()
+
+class LogFollower:
+
+    # name: LogFollower
+    _followers = {}
+    _lock = Lock()
+
+    # Lines kept per container
+    max_lines = 5000
+
+    # Seconds without a viewer before a follower stops streaming
+    idle = 300
+
+    # Seconds between idle checks while the container is quiet
+    idle_check = 30
+
+    # Lines of a container's log from line start onwards, one follower per container
+    def lines(name, start):
+        return LogFollower.get(name).read(start)
+
+    # Wait for lines after start, empty if none arrive in time
+    def wait_lines(name, start, timeout=25):
+        return LogFollower.get(name).wait(start, timeout)
+
+    def get(name):
+        with LogFollower._lock:
+            f = LogFollower._followers.get(name)
+            if not f:
+                f = LogFollower(name)
+                LogFollower._followers[name] = f
+        f.ensure_running()
+        return f
+
+    # Forget a removed container's lines
+    def container_changed(name, status):
+        if status == None:
+            with LogFollower._lock:
+                f = LogFollower._followers.pop(name, None)
+            if f:
+                f.close()
+
+    def __init__(self, name):
+        self.name = name
+        self.buffer = deque(maxlen=LogFollower.max_lines)
+
+        # Line number of buffer[0]
+        self.first = 0
+
+        # Docker timestamp of the last line, the stream resumes after it
+        self.since = None
+
+        self.last_read = time()
+        self.stream = None
+        self.thread = None
+        self.cond = Condition()
+
+    def read(self, start):
+        self.last_read = time()
+        with self.cond:
+            start = max(start - self.first, 0)
+            return list(self.buffer)[start:]
+
+    def wait(self, start, timeout):
+        self.last_read = time()
+        with self.cond:
+            self.cond.wait_for(lambda: self.first + len(self.buffer) > start, timeout)
+        return self.read(start)
+
+    # The stream ends when the container stops, the next read resumes it
+    def ensure_running(self):
+        with self.cond:
+            if self.thread and self.thread.is_alive():
+                return
+
+            # Nothing new until a stopped container starts again
+            if self.thread and not ContainerState.is_running(self.name):
+                return
+            self.thread = Thread(target=self._follow, daemon=True)
+            self.thread.start()
+
+    def close(self):
+        stream = self.stream
+        if stream:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    # A quiet container never yields a chunk, close its stream from here
+    def _watch(self, stopped):
+        while not stopped.wait(LogFollower.idle_check):
+            if time() - self.last_read > LogFollower.idle:
+                stopped.set()
+                self.close()
+
+    def _follow(self):
+        stopped = Event()
+        try:
+            c = client.containers.get(self.name)
+            if self.since:
+                stream = c.logs(stream=True, follow=True, timestamps=True, since=self.since)
+            else:
+                stream = c.logs(stream=True, follow=True, timestamps=True, tail=LogFollower.max_lines)
+            self.stream = stream
+            Thread(target=self._watch, args=(stopped,), daemon=True).start()
+
+            partial = b''
+            for chunk in stream:
+                lines = (partial + chunk).split(b'\n')
+                partial = lines.pop()
+                self._append(lines)
+
+                if time() - self.last_read > LogFollower.idle:
+                    break
+
+            if partial:
+                self._append([partial])
+
+        except docker.errors.NotFound:
+            pass
+        except Exception as e:
+            # Closed by the idle watcher
+            if not stopped.is_set():
+                Log.log(f"{self.name}: Log follower stopped: {e}")
+        finally:
+            stopped.set()
+            self.close()
+            self.stream = None
+
+    def _append(self, raw):
+        lines = []
+        for line in raw:
+            ts, _, text = line.decode('utf-8', errors='replace').partition(' ')
+            since = LogFollower._timestamp(ts)
+
+            # Lines at the resume point were already read
+            if since and self.since and since <= self.since:
+                continue
+            if since:
+                self.since = since
+            lines.append(text)
+
+        if len(lines) < 1:
+            return
+
+        with self.cond:
+            for line in lines:
+                if len(self.buffer) == self.buffer.maxlen:
+                    self.first += 1
+                self.buffer.append(line)
+            self.cond.notify_all()
+
+    # Unix time of a docker log timestamp, microsecond precision
+    def _timestamp(ts):
+        try:
+            secs, _, frac = ts.rstrip('Z').partition('.')
+            t = datetime.strptime(secs, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc)
+            return t.timestamp() + int((frac + '000000')[:6]) / 1000000
+        except Exception:
+            return None
+
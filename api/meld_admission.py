@@ -0,0 +1,166 @@
+# Python
+import os
+from datetime import datetime
+from threading import Thread, Lock, Event
+
+# GroundSeg modules
+from log import Log
+from config_store import ConfigStore
+
+class MeldAdmission:
+
+    # Peak meld memory over the ship's snapshot size until a meld is measured
+    default_factor = 1.5
+
+    # Weight of the newest measurement in a ship's factor
+    alpha = 0.5
+
+    # Melds that finish between samples shouldn't teach it melds are free
+    min_factor = 0.25
+
+    # Bytes always left free for the system and the other ships
+    reserve = 512 * 1024 * 1024
+
+    # Seconds between container memory samples during a meld
+    sample_interval = 2
+
+    # Holds with nothing else melding before a meld is let through anyway
+    max_holds = 6
+
+    def __init__(self, config, urbit):
+        self.config_object = config
+        self.urbit = urbit
+        self.path = f"{config.base_path}/settings/meld_stats.json"
+        self._lock = Lock()
+
+        # patp: estimate of melds that are running
+        self._admitted = {}
+
+        # patp: {"since", "holds", "need", "avail"} of melds waiting for memory
+        self._held = {}
+
+        # patp: {"factor", "estimate", "peak", "base"}
+        self.stats = {}
+        try:
+            if os.path.isfile(self.path):
+                self.stats = ConfigStore.load(self.path)
+        except Exception as e:
+            Log.log(f"Melder: Failed to load meld stats: {e}")
+
+    # Extra memory a meld of the ship is expected to need
+    def estimate(self, patp):
+        factor = self.stats.get(patp, {}).get('factor', self.default_factor)
+        return int(self.base_size(patp) * factor)
+
+    # Snapshot size, bounded by the loom
+    def base_size(self, patp):
+        cfg = self.urbit._urbits[patp]
+        loom = 2 ** int(cfg['loom_size'])
+        chk = MeldAdmission.dir_size(f"{self.urbit._volume_directory}/{patp}/_data/{patp}/.urb/chk")
+        if chk > 0:
+            return min(chk, loom)
+        return loom
+
+    def dir_size(path):
+        total = 0
+        try:
+            with os.scandir(path) as it:
+                for e in it:
+                    if e.is_file(follow_symlinks=False):
+                        total += e.stat(follow_symlinks=False).st_size
+                    elif e.is_dir(follow_symlinks=False):
+                        total += MeldAdmission.dir_size(e.path)
+        except FileNotFoundError:
+            pass
+        return total
+
+    # Reserve memory for a meld, False if it would push the box into swap
+    def admit(self, patp):
+        est = self.estimate(patp)
+        avail = self.config_object._ram_avail
+        with self._lock:
+            if avail != None:
+                # Melds already admitted may not have reached their peak yet
+                pending = sum(self._admitted.values())
+                if est + pending + self.reserve > avail:
+                    hold = self._held.get(patp, {"since": datetime.utcnow(), "holds": 0})
+                    hold['holds'] += 1
+                    hold['need'] = est
+                    hold['avail'] = avail
+
+                    # With nothing else melding no memory is coming back,
+                    # an estimate that never fits would hold the ship forever
+                    if pending > 0 or hold['holds'] <= self.max_holds:
+                        self._held[patp] = hold
+                        Log.log(f"Melder: Holding {patp}, needs ~{est // 1048576} MiB with {avail // 1048576} MiB available")
+                        return False
+
+                    Log.log(f"Melder: Admitting {patp} after {hold['holds'] - 1} holds, needs ~{est // 1048576} MiB with {avail // 1048576} MiB available")
+                    # It can't take more than what's free
+                    est = max(0, min(est, avail - self.reserve))
+
+            self._held.pop(patp, None)
+            self._admitted[patp] = est
+        return True
+
+    # Why a ship's meld is waiting, None if it isn't
+    def held_state(self, patp):
+        hold = self._held.get(patp)
+        if hold == None:
+            return None
+
+        return {
+                "since": hold['since'],
+                "holds": hold['holds'],
+                "maxHolds": self.max_holds,
+                "needMiB": hold['need'] // 1048576,
+                "availMiB": hold['avail'] // 1048576
+                }
+
+    # Forget holds of ships that no longer have a meld scheduled
+    def drop_holds(self, scheduled):
+        with self._lock:
+            for p in list(self._held):
+                if p not in scheduled:
+                    self._held.pop(p)
+
+    # Run the meld and record how much memory it really took
+    def measure(self, patp, meld):
+        est = self._admitted.get(patp, self.estimate(patp))
+        before = self.urbit.urb_docker.memory_usage(patp)
+        peak = [before]
+        done = Event()
+
+        def sample():
+            while not done.wait(self.sample_interval):
+                usage = self.urbit.urb_docker.memory_usage(patp)
+                if usage != None and (peak[0] == None or usage > peak[0]):
+                    peak[0] = usage
+
+        sampler = Thread(target=sample, daemon=True)
+        sampler.start()
+        try:
+            return meld()
+        finally:
+            done.set()
+            sampler.join()
+            with self._lock:
+                self._admitted.pop(patp, None)
+            if before != None and peak[0] != None:
+                self.record(patp, est, peak[0] - before)
+
+    def record(self, patp, est, used):
+        base = self.base_size(patp)
+        if base < 1:
+            return
+
+        old = self.stats.get(patp, {}).get('factor', self.default_factor)
+        factor = max(self.min_factor, (1 - self.alpha) * old + self.alpha * (used / base))
+        self.stats[patp] = {
+                "factor": round(factor, 3),
+                "estimate": est,
+                "peak": used,
+                "base": base
+                }
+        Log.log(f"Melder: {patp} meld used {used // 1048576} MiB, estimated {est // 1048576} MiB")
+        ConfigStore.save(self.path, self.stats)
@@ -1,32 +1,119 @@
 # Python
-from time import sleep
+import heapq
 from datetime import datetime
+from threading import Thread, Lock, Event
 
 # GroundSeg module
 from log import Log
+from meld_admission import MeldAdmission
 
 class Melder:
+
+    # Set when a meld schedule changes or a meld finishes
+    _wake = Event()
+
+    # Seconds before a failed meld is tried again
+    retry_interval = 60
+
+    # Seconds a meld that doesn't fit in memory waits
+    hold_interval = 300
+
     def __init__(self, config, orchestrator):
         self.config_object = config
         self.config = config.config
         self.orchestrator = orchestrator
 
-    # Checks if a meld is due, runs meld
-    def meld_loop(self): 
+        self._lock = Lock()
+        self._running = set()
+        self._retry = {}
+        self._last_start = 0
+        self.admission = MeldAdmission(config, orchestrator.urbit)
+        self.orchestrator.melder = self
+
+    # Reschedule now instead of at the next deadline
+    def wake():
+        Melder._wake.set()
+
+    # Sleeps until the next meld is due or a schedule changes
+    def meld_loop(self):
         Log.log("Melder: Meld thread started")
         while True:
             try:
-                copied = self.orchestrator.urbit._urbits
-                for p in list(copied):
-                    try:
-                        now = int(datetime.utcnow().timestamp())
-                        if copied[p]['meld_schedule']:
-                            if int(copied[p]['meld_next']) <= now:
-                                self.orchestrator.urbit.send_pack_meld(p)
-                    except Exception as e:
-                        Log.log(f"Melder: Unable to check meld status of {p}: {e}")
-
+                timeout = self.dispatch()
             except Exception as e:
                 Log.log(f"Melder: Meld loop error: {e}")
+                timeout = 30
+
+            Melder._wake.wait(timeout)
+            Melder._wake.clear()
+
+    def now():
+        return int(datetime.utcnow().timestamp())
+
+    # (meld time, patp) for every ship with scheduled melds
+    def schedule(self):
+        heap = []
+        urbits = self.orchestrator.urbit._urbits
+        for p in list(urbits):
+            try:
+                if urbits[p]['meld_schedule'] and p not in self._running:
+                    due = max(int(urbits[p]['meld_next']), self._retry.get(p, 0))
+                    heap.append((due, p))
+            except Exception as e:
+                Log.log(f"Melder: Unable to check meld status of {p}: {e}")
+
+        self.admission.drop_holds(set(p for _, p in heap))
+        heapq.heapify(heap)
+        return heap
+
+    # Starts due melds within the limits, returns seconds until the next check
+    def dispatch(self):
+        heap = self.schedule()
+        while len(heap) > 0:
+            now = Melder.now()
+            due, p = heap[0]
+            if due > now:
+                return due - now
+
+            # A finished meld wakes the loop
+            with self._lock:
+                if len(self._running) >= int(self.config['meldWorkers']):
+                    return None
+
+            # Space melds out so their memory peaks don't overlap
+            wait = self._last_start + int(self.config['meldStagger']) - now
+            if wait > 0:
+                return wait
+
+            heapq.heappop(heap)
+
+            # Too big for the memory that's free, smaller ships can go first.
+            # Kept on the heap so the loop still wakes for it when nothing else is due
+            if not self.admission.admit(p):
+                self._retry[p] = now + self.hold_interval
+                heapq.heappush(heap, (self._retry[p], p))
+                continue
+
+            with self._lock:
+                self._running.add(p)
+            self._last_start = now
+            Thread(target=self.run_meld, args=(p,), daemon=True).start()
+
+        return None
 
-            sleep(30)
+    def run_meld(self, patp):
+        try:
+            Log.log(f"Melder: Starting scheduled meld for {patp}")
+            o = self.orchestrator
+            res = self.admission.measure(patp, lambda: o.run_job(patp, 'meld', {}, o.urbit.send_pack_meld, patp))
+            if res == 200:
+                self._retry.pop(patp, None)
+            else:
+                self._retry[patp] = Melder.now() + self.retry_interval
+        except Exception as e:
+            Log.log(f"Melder: Meld failed for {patp}: {e}")
+            self._retry[patp] = Melder.now() + self.retry_interval
+        finally:
+            with self._lock:
+                self._running.discard(patp)
+            Melder.wake()
@@ -1,17 +1,13 @@
 # Python
-import os
 import json
-import zipfile
-from io import BytesIO
 from time import sleep
 
-# Flask
-from flask import send_file
-
 # GroundSeg modules
 from log import Log
+from config_store import ConfigStore
 from mc_docker import MCDocker
 from minio_docker import MinIODocker
+from archive_export import ArchiveExport
 
 class MinIO:
     mc_data = {}
@@ -35,6 +31,7 @@ class MinIO:
         self._volume_directory = f"{self.config['dockerData']}/volumes"
         self.mc_docker = MCDocker()
         self.minio_docker = MinIODocker()
+        self.exporter = ArchiveExport(self.config_object.base_path)
 
         # Set MC Config
         self.load_config()
@@ -103,27 +100,16 @@ class MinIO:
     def delete(self, name):
         return self.minio_docker.delete(name)
 
-    def export(self, patp):
+    def export(self, patp, codec='deflate'):
         name = f"minio_{patp}"
         Log.log(f"{name}: Attempting to export bucket")
         c = self.minio_docker.get_container(name)
         if c:
-            file_name = f"bucket_{patp}.zip"
-            memory_file = BytesIO()
             file_path=f"{self._volume_directory}/{name}/_data/bucket"
+            Log.log(f"{name}: Compressing bucket ({codec})")
+            return self.exporter.export(f"bucket_{patp}", file_path, codec)
 
-            Log.log(f"{name}: Compressing bucket")
-
-            with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(file_path):
-                    arc_dir = root[root.find("_data/")+6:]
-                    for file in files:
-                        zipf.write(os.path.join(root, file), arcname=os.path.join(arc_dir,file))
-
-            memory_file.seek(0)
-
-            Log.log(f"{patp}: Pier successfully exported")
-            return send_file(memory_file, download_name=file_name, as_attachment=True)
+        return 400
 
     def mc_setup(self, name, pier_config):
         Log.log(f"{name}: Attempting to create MinIO admin account")
@@ -188,6 +174,4 @@ class MinIO:
 
     # Save mc.json
     def save_config(self):
-        with open(self.filename,'w') as f:
-            json.dump(self.mc_data, f, indent=4)
-            f.close()
+        return ConfigStore.save(self.filename, self.mc_data)
@@ -1,5 +1,7 @@
 import docker
 from log import Log
+from container_state import ContainerState
+from image_pull import ImagePull
 
 client = docker.from_env()
 
@@ -37,6 +39,7 @@ class MinIODocker:
 
         try:
             c.start()
+            ContainerState.set_status(name, "running")
             Log.log(f"{name}: Successfully started container")
             return self.exec(name, 'mkdir -p /data/bucket')
         except:
@@ -49,6 +52,7 @@ class MinIODocker:
         if c:
             try:
                 c.stop()
+                ContainerState.set_status(name, "exited")
             except Exception as e:
                 Log.log(f"{name}: Failed to stop container")
                 return False
@@ -125,6 +129,10 @@ class MinIODocker:
 
         return True
 
+    # Checked against the container state index
+    def exists(self, name):
+        return ContainerState.exists(name)
+
     def get_container(self, name, show_error=True):
         try:
             c = client.containers.get(name)
@@ -155,13 +163,7 @@ class MinIODocker:
             return True
 
     def pull_image(self, name, image):
-        try:
-            Log.log(f"{name}: Pulling {image}")
-            client.images.pull(image)
-            return True
-        except Exception as e:
-            Log.log(f"{name}: Failed to pull {image}: {e}")
-            return False
+        return ImagePull.pull(client, image, name)
 
     def get_volume(self, name):
         try:
@@ -3,6 +3,7 @@ import json
 
 # GroundSeg modules
 from log import Log
+from config_store import ConfigStore
 from netdata_docker import NetdataDocker
 
 class Netdata:
@@ -87,6 +88,4 @@ class Netdata:
 
     # Save netdata.json
     def save_config(self):
-        with open(self.filename,'w') as f:
-            json.dump(self.data, f, indent=4)
-            f.close()
+        return ConfigStore.save(self.filename, self.data)
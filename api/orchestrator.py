@@ -10,11 +10,16 @@ from werkzeug.utils import secure_filename
 
 # GroundSeg modules
 from log import Log
+from utils import Utils
 from setup import Setup
 from login import Login
 from system_get import SysGet
 from system_post import SysPost
 from bug_report import BugReport
+from pier_stream import PierStream
+from job_queue import JobQueue
+from log_follower import LogFollower
+from container_state import ContainerState
 
 # Docker
 from netdata import Netdata
@@ -27,9 +32,18 @@ class Orchestrator:
 
     wireguard = None
 
+    # Set by the WG refresher, holds the anchor health probes
+    wg_refresher = None
+
+    # Set by the melder, holds meld admission state
+    melder = None
+
     def __init__(self, config):
         self.config_object = config
         self.config = config.config
+        self._streams = {}
+        self.jobs = JobQueue(int(self.config['jobWorkers']))
+        ContainerState.subscribe(LogFollower.container_changed)
 
         if self.config['updateMode'] == 'auto':
             count = 0
@@ -56,7 +70,7 @@ class Orchestrator:
     def handle_setup(self, page, data):
         try:
             if page == "anchor":
-                return Setup.handle_anchor(data, self.config_object, self.wireguard, self.urbit, self.minio)
+                return Setup.handle_anchor(data, self.config_object, self.wireguard, self.urbit, self.minio, self.register_urbits)
 
             if page == "password":
                 return Setup.handle_password(data, self.config_object)
@@ -72,14 +86,14 @@ class Orchestrator:
     #
 
 
-    def handle_login_request(self, data):
+    def handle_login_request(self, data, agent='', addr=''):
         now = datetime.now()
         s = self.config_object.login_status
         unlocked = s['end'] < now
         if unlocked:
             res = Login.handle_login(data, self.config_object)
             if res:
-                return Login.make_cookie(self.config_object)
+                return Login.make_cookie(self.config_object, agent, addr)
         return Login.failed(self.config_object, s['end'] < now)
 
     def handle_login_status(self):
@@ -119,28 +133,32 @@ class Orchestrator:
 
     # Get all details of Urbit ID
     def get_urbit(self, urbit_id):
-        return self.urbit.get_info(urbit_id)
+        info = self.urbit.get_info(urbit_id)
+        if type(info) == dict:
+            # Set while a scheduled meld waits for memory
+            info['meldHeld'] = self.melder.admission.held_state(urbit_id) if self.melder else None
+        return info
 
     # Handle POST request relating to Urbit ID
     def urbit_post(self ,urbit_id, data):
         try:
             # Boot new Urbit
             if data['app'] == 'boot-new':
-                return self.urbit.create(urbit_id, data.get('data'))
+                return self.run_job(urbit_id, 'boot-new', data, self.urbit.create, urbit_id, data.get('data'))
 
             # Check if Urbit Pier exists
-            if not self.urbit.urb_docker.get_container(urbit_id):
+            if not self.urbit.urb_docker.get_status(urbit_id):
                 return 400
 
             # Wireguard requests
             if data['app'] == 'wireguard':
                 if data['data'] == 'toggle':
-                    return self.urbit.toggle_network(urbit_id)
+                    return self.run_job(urbit_id, 'wireguard-toggle', data, self.urbit.toggle_network, urbit_id)
 
             # Urbit Pier requests
             if data['app'] == 'pier':
                 if data['data'] == 'toggle':
-                    return self.urbit.toggle_power(urbit_id)
+                    return self.run_job(urbit_id, 'toggle', data, self.urbit.toggle_power, urbit_id)
 
                 if data['data'] == '+code':
                     return self.urbit.get_code(urbit_id)
@@ -149,10 +167,10 @@ class Orchestrator:
                     return self.urbit.toggle_autostart(urbit_id)
 
                 if data['data'] == 'swap-url':
-                    return self.urbit.swap_url(urbit_id)
+                    return self.run_job(urbit_id, 'swap-url', data, self.urbit.swap_url, urbit_id)
 
                 if data['data'] == 'loom':
-                    return self.urbit.set_loom(urbit_id,data['size'])
+                    return self.run_job(urbit_id, 'loom', data, self.urbit.set_loom, urbit_id, data['size'])
 
                 if data['data'] == 'schedule-meld':
                     return self.urbit.schedule_meld(urbit_id, data['frequency'], data['hour'], data['minute'])
@@ -161,32 +179,32 @@ class Orchestrator:
                     return self.urbit.toggle_meld(urbit_id)
 
                 if data['data'] == 'do-meld':
-                    return self.urbit.send_pack_meld(urbit_id)
+                    return self.run_job(urbit_id, 'meld', data, self.urbit.send_pack_meld, urbit_id)
 
                 if data['data'] == 'delete':
-                    return self.urbit.delete(urbit_id)
+                    return self.run_job(urbit_id, 'delete', data, self.urbit.delete, urbit_id)
 
                 if data['data'] == 'export':
-                    return self.urbit.export(urbit_id)
+                    return self.urbit.export(urbit_id, data.get('codec', 'deflate'))
 
                 if data['data'] == 's3-update':
-                    return self.urbit.set_minio(urbit_id)
+                    return self.run_job(urbit_id, 's3-update', data, self.urbit.set_minio, urbit_id)
 
                 if data['data'] == 's3-unlink':
-                    return self.urbit.unlink_minio(urbit_id)
+                    return self.run_job(urbit_id, 's3-unlink', data, self.urbit.unlink_minio, urbit_id)
 
             # Custom domain
             if data['app'] == 'cname':
-                return self.urbit.custom_domain(urbit_id, data['data'])
+                return self.run_job(urbit_id, 'cname', data, self.urbit.custom_domain, urbit_id, data['data'])
 
             # MinIO requests
             if data['app'] == 'minio':
                 pwd = data.get('password')
                 if pwd != None:
-                    return self.minio.create_minio(urbit_id, pwd, self.urbit,data['link'])
+                    return self.run_job(urbit_id, 'minio', data, self.minio.create_minio, urbit_id, pwd, self.urbit, data['link'])
 
                 if data['data'] == 'export':
-                    return self.minio.export(urbit_id)
+                    return self.minio.export(urbit_id, data.get('codec', 'deflate'))
 
             return 400
 
@@ -195,11 +213,63 @@ class Orchestrator:
 
         return 400
 
+    # Long running ship operations, one at a time per ship.
+    # Clients that send async get the job id instead of waiting
+    def run_job(self, urbit_id, action, data, fn, *args):
+        job_id = self.jobs.submit(urbit_id, action, fn, *args)
+        if data.get('async'):
+            return {'job': job_id}
+        return self.jobs.wait(job_id)
+
+    # Register every ship with StarTram, queued behind each ship's other jobs
+    def register_urbits(self, url):
+        job_ids = [self.jobs.submit(p, 'register', self.urbit.register_urbit, p, url) for p in self.config['piers']]
+        for job_id in job_ids:
+            self.jobs.wait(job_id)
+
+    def get_jobs(self, job_id=None, urbit_id=None):
+        if job_id:
+            return self.jobs.status(job_id) or 400
+        return self.jobs.status(key=urbit_id)
+
+
+    # Stream pier or bucket export, GET so downloads can be resumed with ranges
+    def urbit_export(self, urbit_id, app, codec):
+        try:
+            if app == 'pier':
+                return self.urbit.export(urbit_id, codec)
+
+            if app == 'minio':
+                return self.minio.export(urbit_id, codec)
+
+        except Exception as e:
+            Log.log(f"Urbit: Export request failed: {e}")
+
+        return 400
+
 
     #
     #   Anchor Settings
     #
 
+    # Whether an export of a pier or bucket can start
+    def export_available(self, urbit_id, app, codec):
+        try:
+            if codec not in self.urbit.exporter.codecs:
+                return False
+
+            if app == 'pier':
+                return ContainerState.exists(urbit_id)
+
+            if app == 'minio':
+                return ContainerState.exists(f"minio_{urbit_id}")
+
+        except Exception as e:
+            Log.log(f"Urbit: Export check failed: {e}")
+
+        return False
+
+
     # Get anchor registration information
     def get_anchor_settings(self):
         lease_end = None
@@ -224,7 +294,10 @@ class Orchestrator:
                 "wgReg": self.config['wgRegistered'],
                 "wgRunning": self.wireguard.is_running(),
                 "lease": lease_end,
-                "ongoing": ongoing
+                "ongoing": ongoing,
+                "startram": self.wireguard.startram.metrics(),
+                "health": self.wg_refresher.probe.summary() if self.wg_refresher else {},
+                "recovery": list(self.wg_refresher.recovery.history) if self.wg_refresher else []
                 }
             }
 
@@ -235,7 +308,8 @@ class Orchestrator:
 
 
     # Get all system information
-    def get_system_settings(self):
+    # probes=False leaves out the slow nmcli fields
+    def get_system_settings(self, probes=True):
         is_vm = "vm" == self.config_object.device_mode
 
         ver = str(self.config_object.version)
@@ -251,7 +325,7 @@ class Orchestrator:
                 "updateMode": self.config['updateMode'],
                 "minio": self.minio.minios_on,
                 "containers" : SysGet.get_containers(),
-                "sessions": len(self.config['sessions']),
+                "sessions": self.config_object.sessions.count(),
                 "gsVersion": ver,
                 "uiBranch": ui_branch,
                 "netdata": f"http://{socket.gethostname()}.local:{self.netdata.data['port']}"
@@ -263,10 +337,11 @@ class Orchestrator:
                     "ram": self.config_object._ram,
                     "cpu": self.config_object._cpu,
                     "temp": self.config_object._core_temp,
-                    "disk": self.config_object._disk,
-                    "connected": SysGet.get_connection_status(),
-                    "ethOnly": SysGet.get_ethernet_status()
+                    "disk": self.config_object._disk
                     }
+            if probes:
+                optional['connected'] = SysGet.get_connection_status()
+                optional['ethOnly'] = SysGet.get_ethernet_status()
 
         settings = {**optional, **required}
         return {'system': settings}
@@ -329,8 +404,7 @@ class Orchestrator:
                     self.config['wgRegistered'] = True
                     self.config['wgOn'] = True
 
-                    for patp in self.config['piers']:
-                        self.urbit.register_urbit(patp, url)
+                    self.register_urbits(url)
 
                     if self.config_object.save_config():
                         if self.wireguard.start():
@@ -344,15 +418,46 @@ class Orchestrator:
 
         # logs module
         if module == 'logs':
+            if data['action'] in ('view', 'tail'):
+                try:
+                    line = int(data.get('haveLine'))
+                except (TypeError, ValueError):
+                    return 400
+
             if data['action'] == 'view':
-                return self.get_log_lines(data['container'], data['haveLine'])
+                return self.get_log_lines(data['container'], line)
+
+            if data['action'] == 'tail':
+                return self.tail_log_lines(data['container'], line)
 
             if data['action'] == 'export':
-                return '\n'.join(self.get_log_lines(data['container'], 0))
+                return '\n'.join(self.full_log_lines(data['container']))
 
         return module
 
     def get_log_lines(self, container, line):
+        if container == 'groundseg':
+            return Log.get_log(line)
+
+        name = self.log_container(container)
+        if name:
+            return LogFollower.lines(name, line)
+
+        return []
+
+    # Waits for new log lines instead of returning empty
+    def tail_log_lines(self, container, line):
+        if container == 'groundseg':
+            return Log.tail_log(line)
+
+        name = self.log_container(container)
+        if name:
+            return LogFollower.wait_lines(name, line)
+
+        return []
+
+    # Complete log for export
+    def full_log_lines(self, container):
         blob = ''
 
         if container == 'wireguard':
@@ -362,7 +467,7 @@ class Orchestrator:
             blob = self.netdata.logs()
 
         if container == 'groundseg':
-            return Log.get_log()[line:]
+            return Log.get_log()
 
         if 'minio_' in container:
             blob = self.minio.minio_logs(container)
@@ -370,9 +475,26 @@ class Orchestrator:
         if container in self.urbit._urbits:
             blob = self.urbit.logs(container)
 
+        if not blob:
+            return []
+
+        return blob.decode('utf-8').split('\n')
 
-        return blob.decode('utf-8').split('\n')[line:]
+    # Docker container name behind a log viewer selection
+    def log_container(self, container):
+        if container == 'wireguard':
+            return self.wireguard.data['wireguard_name']
 
+        if container == 'netdata':
+            return self.netdata.data['netdata_name']
+
+        if 'minio_' in container:
+            return container
+
+        if container in self.urbit._urbits:
+            return container
+
+        return None
 
     #
     #   Pier Upload
@@ -385,9 +507,8 @@ class Orchestrator:
             if data['action'] == 'status':
                 try:
                     res = self.config_object.upload_status[patp]
-                    if res['status'] == 'extracting':
-                        res['progress']['current'] = self.get_directory_size(f"{self.config['dockerData']}/volumes/{patp}/_data")
-                        return res
+                    if 'counter' in res:
+                        return {'status': res['status'], 'progress': res['counter'].snapshot()}
                     return res
                 except Exception as e:
                     Log.log(f"Upload: Failed to get status {e}")
@@ -401,18 +522,6 @@ class Orchestrator:
             Log.log(f"Upload: Failed to get upload status: {e}")
             return {'status':'none'}
 
-    def get_directory_size(self, directory):
-        total_size = 0
-        with os.scandir(directory) as it:
-            for entry in it:
-                if entry.is_file():
-                    total_size += entry.stat().st_size
-                elif entry.is_dir():
-                    total_size += self.get_directory_size(entry.path)
-        return total_size
-
-
-
     def handle_upload(self, req):
         # change to temp mode (DO NOT SAVE CONFIG)
         if self.config['updateMode'] == 'auto':
@@ -423,6 +532,10 @@ class Orchestrator:
         filename = secure_filename(file.filename)
         patp = filename.split('.')[0]
 
+        # Tarballs are extracted as the chunks arrive
+        if PierStream.supports(filename):
+            return self.handle_stream_upload(req, file, filename, patp)
+
         self.config_object.upload_status[patp] = {'status':'uploading'}
 
         # Create subfolder
@@ -450,9 +563,15 @@ class Orchestrator:
             return "File exists, try uploading again"
 
         try:
+            data = file.stream.read()
+            if not PierStream.chunk_ok(data, req.form.get('dzchunksha256')):
+                Log.log(f"{patp}: Checksum mismatched")
+                self.restore_update_mode()
+                return "Checksum mismatched"
+
             with open(save_path, 'ab') as f:
                 f.seek(int(req.form['dzchunkbyteoffset']))
-                f.write(file.stream.read())
+                f.write(data)
         except Exception as e:
             Log.log(f"{patp}: Error writing to disk: {e}")
 
@@ -477,11 +596,10 @@ class Orchestrator:
                 return "File size mismatched"
             else:
                 Log.log(f"{patp}: Upload complete")
-                res = self.urbit.boot_existing(filename)
-                if self.config['updateMode'] == 'temp':
-                    self.config['updateMode'] = 'auto'
-                    self.config_object.save_config()
-                return res
+                self.restore_update_mode()
+
+                # Booted in the background, Dropzone follows the job
+                return {'job': self.jobs.submit(patp, 'upload-boot', self.urbit.boot_existing, filename)}
 
         else:
             # Not final chunk yet
@@ -492,3 +610,62 @@ class Orchestrator:
             self.config_object.save_config()
 
         return 400
+
+    def handle_stream_upload(self, req, file, filename, patp):
+        current_chunk = int(req.form['dzchunkindex'])
+        total_chunks = int(req.form['dztotalchunkcount'])
+        stream = self._streams.get(patp)
+
+        try:
+            if current_chunk == 0:
+                if stream:
+                    Log.log(f"{patp}: Discarding previous upload")
+                    stream.abort()
+
+                if not Utils.check_patp(patp):
+                    self.restore_update_mode()
+                    return "File is invalid"
+
+                Log.log(f"{patp}: Starting streamed upload")
+                data_dir = self.urbit.reset_volume(patp)
+                stream = PierStream(patp, filename, data_dir, int(req.form['dztotalfilesize']))
+                self.config_object.upload_status[patp] = {'status':'extracting','counter':stream.progress}
+                self._streams[patp] = stream
+
+            if not stream:
+                raise Exception("Upload was not started")
+
+            stream.write(int(req.form['dzchunkbyteoffset']), file.stream.read(), req.form.get('dzchunksha256'))
+
+        except Exception as e:
+            Log.log(f"{patp}: Streamed upload failed: {e}")
+            self._streams.pop(patp, None)
+            self.config_object.upload_status.pop(patp, None)
+            if stream:
+                stream.abort()
+                if stream.error:
+                    self.restore_update_mode()
+                    return stream.error
+
+            self.restore_update_mode()
+            return "Can't write to disk"
+
+        # Not final chunk yet
+        if current_chunk + 1 != total_chunks:
+            return 200
+
+        Log.log(f"{patp}: Upload complete")
+        err = stream.finish()
+        self._streams.pop(patp, None)
+        self.restore_update_mode()
+        if err:
+            self.config_object.upload_status.pop(patp, None)
+            return err
+
+        # Booted in the background, Dropzone follows the job
+        return {'job': self.jobs.submit(patp, 'upload-boot', self.urbit.boot_streamed, patp)}
+
+    def restore_update_mode(self):
+        if self.config['updateMode'] == 'temp':
+            self.config['updateMode'] = 'auto'
+            self.config_object.save_config()
@@ -0,0 +1,158 @@
+# Python
+import os
+import shutil
+import zipfile
+import subprocess
+from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+
+# Modules
+import zstandard
+
+# GroundSeg modules
+from log import Log
+
+class ParallelExtract:
+
+    # Upper bound on extraction workers
+    max_workers = 8
+
+    def workers():
+        return max(1, min(ParallelExtract.max_workers, os.cpu_count() or 1))
+
+    # Inflate zip members on a pool, each worker with its own file handle.
+    # rename maps a member name to its path under dest_dir
+    def extract_zip(path, dest_dir, progress, rename=None, workers=None):
+        workers = workers or ParallelExtract.workers()
+        rename = rename or (lambda name: name)
+        with zipfile.ZipFile(path) as zip_ref:
+            members = zip_ref.infolist()
+
+        for m in members:
+            if m.is_dir():
+                ParallelExtract.make_dir(dest_dir, rename(m.filename))
+
+        # Largest first onto the least loaded worker
+        files = sorted([m for m in members if not m.is_dir()], key=lambda m: m.compress_size, reverse=True)
+        groups = [[] for _ in range(workers)]
+        loads = [0] * workers
+        for m in files:
+            i = loads.index(min(loads))
+            groups[i].append(m)
+            loads[i] += m.compress_size
+
+        Log.log(f"Extract: Inflating {len(files)} files with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(ParallelExtract._zip_worker, path, g, dest_dir, progress, rename) for g in groups if g]
+            for f in futures:
+                f.result()
+
+    def _zip_worker(path, members, dest_dir, progress, rename):
+        with zipfile.ZipFile(path) as zip_ref:
+            for m in members:
+                with zip_ref.open(m) as src:
+                    ParallelExtract.write_member(src, dest_dir, rename(m.filename), progress)
+
+    def zip_names(path):
+        with zipfile.ZipFile(path) as zip_ref:
+            return zip_ref.namelist()
+
+    # Decompressed tar stream for tarfile, gzip goes through pigz when installed
+    def tar_stream(src, filename):
+        if filename.endswith(".tar.zst"):
+            return zstandard.ZstdDecompressor().stream_reader(src), "r|", None
+
+        if filename.endswith(".tar.gz") or filename.endswith(".tgz"):
+            pigz = shutil.which('pigz')
+            if pigz:
+                proc = subprocess.Popen([pigz, '-dc'], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+                proc.pump = Thread(target=ParallelExtract._pump, args=(src, proc.stdin), daemon=True)
+                proc.pump.start()
+                return proc.stdout, "r|", proc
+            return src, "r|gz", None
+
+        return src, "r|", None
+
+    def _pump(src, dst):
+        try:
+            while chunk := src.read(1024 * 1024):
+                dst.write(chunk)
+        except Exception as e:
+            Log.log(f"Extract: Decoder input closed: {e}")
+            # Keep reading so whoever feeds src never blocks
+            while src.read(1024 * 1024):
+                pass
+        finally:
+            try:
+                dst.close()
+            except Exception:
+                pass
+
+    # Read what's left of the decoder output and wait for it to exit.
+    # A stream tarfile reads can end early on a corrupt gzip, pigz's status catches it
+    def finish_stream(src, proc):
+        while src.read(1024 * 1024):
+            pass
+        if proc:
+            code = proc.wait()
+            if code != 0:
+                raise Exception(f"pigz exited with status {code}")
+
+    # Stop the decoder and its feeder, for extractions that ended early
+    def close_stream(proc, timeout=5):
+        if not proc:
+            return
+        try:
+            if proc.poll() == None:
+                proc.kill()
+            proc.wait(timeout)
+            proc.stdout.close()
+        except Exception as e:
+            Log.log(f"Extract: Unable to stop decoder: {e}")
+        proc.pump.join(timeout)
+
+    # Copy an archive member in chunks, counting bytes as they land
+    def write_member(src, dest_dir, name, progress, count_bytes=True):
+        if not name:
+            return
+        dest = ParallelExtract.safe_path(dest_dir, name)
+        if not dest:
+            return
+
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, 'wb') as f:
+            while chunk := src.read(1024 * 1024):
+                f.write(chunk)
+                if count_bytes:
+                    progress.add(len(chunk))
+        progress.add(0, 1)
+
+    def make_dir(dest_dir, name):
+        if not name:
+            return
+        dest = ParallelExtract.safe_path(dest_dir, name)
+        if dest:
+            os.makedirs(dest, exist_ok=True)
+
+    # Path inside dest_dir, None if the member would escape it
+    def safe_path(dest_dir, name):
+        parts = [p for p in os.path.normpath(name).split('/') if p not in ('', '.')]
+        if len(parts) < 1 or '..' in parts or os.path.isabs(name):
+            Log.log(f"Extract: Skipping unsafe path {name}")
+            return None
+        return os.path.join(dest_dir, *parts)
+
+
+# Counts bytes read from the archive into a progress counter
+class CountingReader:
+    def __init__(self, f, progress):
+        self.f = f
+        self.progress = progress
+
+    def read(self, n=-1):
+        data = self.f.read(n)
+        self.progress.add(len(data))
+        return data
+
+    def readable(self):
+        return True
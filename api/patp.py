@@ -0,0 +1,153 @@
+# Syllables, byte value is the index
+_pre = "dozmarbinwansamlitsighidfidlissogdirwacsabwissibrigsoldopmodfoglidhopdardorlorhodfolrintogsilmirholpaslacrovlivdalsatlibtabhanticpidtorbolfosdotlosdilforpilramtirwintadbicdifrocwidbisdasmidloprilnardapmolsanlocnovsitnidtipsicropwitnatpanminritpodmottamtolsavposnapnopsomfinfonbanmorworsipronnorbotwicsocwatdolmagpicdavbidbaltimtasmalligsivtagpadsaldivdactansidfabtarmonranniswolmispallasdismaprabtobrollatlonnodnavfignomnibpagsopralbilhaddocridmocpacravripfaltodtiltinhapmicfanpattaclabmogsimsonpinlomrictapfirhasbosbatpochactidhavsaplindibhosdabbitbarracparloddosbortochilmactomdigfilfasmithobharmighinradmashalraglagfadtopmophabnilnosmilfopfamdatnoldinhatnacrisfotribhocnimlarfitwalrapsarnalmoslandondanladdovrivbacpollaptalpitnambonrostonfodponsovnocsorlavmatmipfip"
+_suf = "zodnecbudwessevpersutletfulpensytdurwepserwylsunrypsyxdyrnuphebpeglupdepdysputlughecryttyvsydnexlunmeplutseppesdelsulpedtemledtulmetwenbynhexfebpyldulhetmevruttylwydtepbesdexsefwycburderneppurrysrebdennutsubpetrulsynregtydsupsemwynrecmegnetsecmulnymtevwebsummutnyxrextebfushepbenmuswyxsymselrucdecwexsyrwetdylmynmesdetbetbeltuxtugmyrpelsyptermebsetdutdegtexsurfeltudnuxruxrenwytnubmedlytdusnebrumtynseglyxpunresredfunrevrefmectedrusbexlebduxrynnumpyxrygryxfeptyrtustyclegnemfermertenlusnussyltecmexpubrymtucfyllepdebbermughuttunbylsudpemdevlurdefbusbeprunmelpexdytbyttyplevmylwedducfurfexnulluclennerlexrupnedlecrydlydfenwelnydhusrelrudneshesfetdesretdunlernyrsebhulrylludremlysfynwerrycsugnysnyllyndyndemluxfedsedbecmunlyrtesmudnytbyrsenwegfyrmurtelreptegpecnelnevfes"
+
+PREFIXES = tuple(_pre[i:i+3] for i in range(0, len(_pre), 3))
+SUFFIXES = tuple(_suf[i:i+3] for i in range(0, len(_suf), 3))
+
+# syllable: byte value
+PREFIX_INDEX = {s: i for i, s in enumerate(PREFIXES)}
+SUFFIX_INDEX = {s: i for i, s in enumerate(SUFFIXES)}
+
+# Feistel round keys used to scramble planet addresses
+_raku = (0xb76d5eed, 0xee281300, 0x85bcae01, 0x4b387af7)
+
+class Patp:
+
+    # Same rules GroundSeg has always used: galaxies or whole -word- blocks, no doz lead
+    def valid(patp):
+        # Make sure patp is string
+        if type(patp) != str:
+            return False
+
+        # Remove sig from patp
+        if patp.startswith("~"):
+            patp = patp[1:]
+
+        # patps cannot start with doz
+        if patp.startswith("doz"):
+            return False
+
+        # Galaxy check
+        if len(patp) == 3:
+            return patp in SUFFIX_INDEX
+
+        for p in patp.split("-"):
+            if len(p) != 6 or p[:3] not in PREFIX_INDEX or p[3:] not in SUFFIX_INDEX:
+                return False
+
+        return True
+
+    # @p to its integer, None if it isn't one
+    def to_int(patp):
+        if type(patp) != str:
+            return None
+
+        words = patp.lstrip('~').replace('--', '-').split('-')
+        n = 0
+        try:
+            if len(words) == 1 and len(words[0]) == 3:
+                return SUFFIX_INDEX[words[0]]
+
+            for w in words:
+                if len(w) != 6:
+                    return None
+                n = (n << 16) | (PREFIX_INDEX[w[:3]] << 8) | SUFFIX_INDEX[w[3:]]
+        except KeyError:
+            return None
+
+        return Patp._fynd(n)
+
+    # Integer to its @p
+    def from_int(n):
+        if n < 0:
+            raise ValueError("@p can't be negative")
+
+        sxz = Patp._fein(n)
+        if sxz < 0x100:
+            return f"~{SUFFIXES[sxz]}"
+
+        words = []
+        while sxz > 0:
+            w = sxz & 0xffff
+            words.append(f"{PREFIXES[w >> 8]}{SUFFIXES[w & 0xff]}")
+            sxz >>= 16
+
+        # Words are joined by - and every four by --
+        out = ''
+        for i, w in enumerate(words):
+            if i == 0:
+                out = w
+            else:
+                out = w + ('--' if i % 4 == 0 else '-') + out
+        return f"~{out}"
+
+    # Ships sort by their number rather than their name
+    def sort_key(patp):
+        n = Patp.to_int(patp)
+        return (n == None, n or 0, patp)
+
+    def _fein(n):
+        if 0x10000 <= n <= 0xffffffff:
+            return 0x10000 + Patp._feis(n - 0x10000)
+        if 0x100000000 <= n <= 0xffffffffffffffff:
+            return (n & 0xffffffff00000000) | Patp._fein(n & 0xffffffff)
+        return n
+
+    def _fynd(n):
+        if 0x10000 <= n <= 0xffffffff:
+            return 0x10000 + Patp._tail(n - 0x10000)
+        if 0x100000000 <= n <= 0xffffffffffffffff:
+            return (n & 0xffffffff00000000) | Patp._fynd(n & 0xffffffff)
+        return n
+
+    def _feis(m):
+        a, b, k = 0xffff, 0x10000, 0xffffffff
+        c = Patp._fe(4, a, b, m)
+        return c if c < k else Patp._fe(4, a, b, c)
+
+    def _tail(m):
+        a, b, k = 0xffff, 0x10000, 0xffffffff
+        c = Patp._fen(4, a, b, m)
+        return c if c < k else Patp._fen(4, a, b, c)
+
+    def _fe(r, a, b, m):
+        ell, arr = m % a, m // a
+        for j in range(1, r + 1):
+            eff = Patp._muk(_raku[j - 1], arr)
+            ell, arr = arr, (ell + eff) % (a if j % 2 else b)
+
+        if r % 2 or arr == a:
+            return a * arr + ell
+        return a * ell + arr
+
+    def _fen(r, a, b, m):
+        ahh = m // a if r % 2 else m % a
+        ale = m % a if r % 2 else m // a
+        ell = ahh if ale == a else ale
+        arr = ale if ale == a else ahh
+
+        for j in range(r, 0, -1):
+            eff = Patp._muk(_raku[j - 1], ell)
+            ell, arr = (arr + (a if j % 2 else b) - eff % (a if j % 2 else b)) % (a if j % 2 else b), ell
+
+        return a * arr + ell
+
+    # murmur3 x86 32 of the two low bytes
+    def _muk(seed, key):
+        k1 = (key & 0xff) | (key & 0xff00)
+        h1 = seed
+        c1, c2 = 0xcc9e2d51, 0x1b873593
+
+        k1 = (k1 * c1) & 0xffffffff
+        k1 = ((k1 << 15) | (k1 >> 17)) & 0xffffffff
+        k1 = (k1 * c2) & 0xffffffff
+        h1 ^= k1
+
+        h1 ^= 2
+        h1 ^= h1 >> 16
+        h1 = (h1 * 0x85ebca6b) & 0xffffffff
+        h1 ^= h1 >> 13
+        h1 = (h1 * 0xc2b2ae35) & 0xffffffff
+        h1 ^= h1 >> 16
+        return h1
@@ -0,0 +1,47 @@
+# Python
+import os
+
+# GroundSeg modules
+from log import Log
+
+class PierLayout:
+
+    # Works out where every archive member belongs from the member names alone
+    def __init__(self, patp, names):
+        self.patp = patp
+        self.prefixes = []
+        for name in names:
+            parts = PierLayout.split(name)
+            if '.urb' in parts:
+                prefix = parts[:parts.index('.urb')]
+                if prefix not in self.prefixes:
+                    self.prefixes.append(prefix)
+
+    # Error string if the archive doesn't hold exactly one pier
+    def error(self):
+        if len(self.prefixes) > 1:
+            Log.log(f"{self.patp}: Multiple ships ({len(self.prefixes)}) detected in pier directory")
+            return "Multiple ships detected in pier directory"
+        if len(self.prefixes) < 1:
+            Log.log(f"{self.patp}: No ships detected in pier directory")
+            return "No Urbit ship found in pier directory"
+
+        Log.log(f"{self.patp}: .urb subdirectory in /{'/'.join(self.prefixes[0])}")
+        return None
+
+    # Path relative to the volume data directory the member is written to
+    def destination(self, name):
+        parts = PierLayout.split(name)
+        if len(parts) < 1 or '..' in parts or os.path.isabs(name):
+            return None
+        return os.path.join(*PierLayout.relocate(parts, self.prefixes[0], self.patp))
+
+    def split(name):
+        return [p for p in os.path.normpath(name).split('/') if p not in ('', '.')]
+
+    # Pier contents go under the patp, everything else under unused
+    def relocate(parts, prefix, patp):
+        n = len(prefix)
+        if parts[:n] == prefix:
+            return [patp] + parts[n:]
+        return ['unused'] + parts
@@ -0,0 +1,193 @@
+# Python
+import os
+import hashlib
+import tarfile
+from threading import Thread
+
+# GroundSeg modules
+from log import Log
+from extract_progress import ExtractProgress
+from parallel_extract import ParallelExtract, CountingReader
+from pier_layout import PierLayout
+
+class PierStream:
+
+    # extension: tarfile stream mode
+    modes = {
+            "tar.gz": "r|gz",
+            "tgz": "r|gz",
+            "tar.zst": "r|",
+            "tar": "r|"
+            }
+
+    def supports(filename):
+        return PierStream.mode_for(filename) != None
+
+    def mode_for(filename):
+        for ext, mode in PierStream.modes.items():
+            if filename.endswith(f".{ext}"):
+                return mode
+        return None
+
+    def __init__(self, patp, filename, data_dir, total_size):
+        self.patp = patp
+        self.filename = filename
+        self.data_dir = data_dir
+        self.total_size = total_size
+
+        self.pier_dir = os.path.join(data_dir, patp)
+        self.staging_dir = os.path.join(data_dir, '.staging')
+        self.unused_dir = os.path.join(data_dir, 'unused')
+
+        # Path components leading to .urb, None until it is seen
+        self.prefix = None
+
+        self.received = 0
+        self.bytes_written = 0
+        self.files_written = 0
+        self.error = None
+
+        r, w = os.pipe()
+        self._reader = os.fdopen(r, 'rb')
+        self._writer = os.fdopen(w, 'wb')
+
+        # Compressed bytes consumed by the extractor
+        self.progress = ExtractProgress(total_size)
+
+        self._thread = Thread(target=self._extract, daemon=True)
+        self._thread.start()
+
+    # Feed the next uploaded chunk to the extractor, checksum is the chunk's sha256
+    def write(self, offset, data, checksum=None):
+        if offset != self.received:
+            raise Exception(f"Expected chunk at byte {self.received}, got {offset}")
+
+        if not PierStream.chunk_ok(data, checksum):
+            Log.log(f"{self.patp}: Checksum mismatched for chunk at byte {offset}")
+            self.error = "Checksum mismatched"
+            raise Exception(self.error)
+
+        self.received += len(data)
+        self._writer.write(data)
+        self._writer.flush()
+
+    # Checked per chunk so a corrupted upload stops at the bad chunk
+    def chunk_ok(data, checksum):
+        if not checksum:
+            return True
+        return hashlib.sha256(data).hexdigest() == checksum.lower()
+
+    # Wait for extraction to end, returns an error string or None
+    def finish(self):
+        self._close_writer()
+        self._thread.join()
+
+        if self.error:
+            return self.error
+
+        if self.received != self.total_size:
+            Log.log(f"{self.patp}: File size mismatched")
+            return "File size mismatched"
+
+        if self.prefix == None:
+            Log.log(f"{self.patp}: No ships detected in pier directory")
+            return "No Urbit ship found in pier directory"
+
+        Log.log(f"{self.patp}: Extracted {self.files_written} files ({self.bytes_written} bytes)")
+        return None
+
+    def abort(self):
+        self._close_writer()
+        self._thread.join(5)
+
+    def _close_writer(self):
+        try:
+            self._writer.close()
+        except Exception:
+            pass
+
+    def _extract(self):
+        Log.log(f"{self.patp}: Extracting {self.filename} while uploading")
+        proc = None
+        try:
+            src = CountingReader(self._reader, self.progress)
+            src, mode, proc = ParallelExtract.tar_stream(src, self.filename)
+
+            with tarfile.open(fileobj=src, mode=mode) as tar:
+                for member in tar:
+                    self._extract_member(tar, member)
+
+            # Trailing padding, the uploader still has to write it
+            ParallelExtract.finish_stream(src, proc)
+
+        except Exception as e:
+            Log.log(f"{self.patp}: Failed to extract {self.filename}: {e}")
+            if not self.error:
+                self.error = "File extraction failed"
+
+        # Unblock the uploader if extraction stopped early
+        try:
+            self._reader.close()
+        except Exception:
+            pass
+
+        # Decoder and its feeder don't outlive the extraction
+        ParallelExtract.close_stream(proc)
+
+    def _extract_member(self, tar, member):
+        if not ParallelExtract.safe_path(self.data_dir, member.name):
+            return
+        parts = [p for p in os.path.normpath(member.name).split('/') if p not in ('', '.')]
+
+        if not (member.isfile() or member.isdir()):
+            Log.log(f"{self.patp}: Skipping {member.name}")
+            return
+
+        if '.urb' in parts:
+            self._found_urb(parts[:parts.index('.urb')])
+
+        dest = self._destination(parts)
+        if dest == None:
+            return
+
+        member.name = os.path.relpath(dest, self.data_dir)
+        tar.extract(member, self.data_dir)
+
+        if member.isfile():
+            self.bytes_written += member.size
+            self.files_written += 1
+            self.progress.add(0, 1)
+
+    # Pier location is known once the first .urb path arrives
+    def _found_urb(self, prefix):
+        if self.prefix == None:
+            self.prefix = prefix
+            Log.log(f"{self.patp}: .urb subdirectory in /{'/'.join(prefix)}")
+
+            # Relocate anything that arrived before the .urb with renames
+            if os.path.isdir(self.staging_dir):
+                src = os.path.join(self.staging_dir, *prefix)
+                if os.path.isdir(src):
+                    os.rename(src, self.pier_dir)
+                if os.path.isdir(self.staging_dir):
+                    if len(os.listdir(self.staging_dir)) > 0:
+                        Log.log(f"{self.patp}: Moving unused items to {self.unused_dir}")
+                        os.rename(self.staging_dir, self.unused_dir)
+                    else:
+                        os.rmdir(self.staging_dir)
+
+        elif self.prefix != prefix:
+            Log.log(f"{self.patp}: Multiple ships detected in pier directory")
+            self.error = "Multiple ships detected in pier directory"
+            raise Exception(self.error)
+
+    def _destination(self, parts):
+        if self.prefix == None:
+            return os.path.join(self.staging_dir, *parts)
+
+        if parts == self.prefix:
+            os.makedirs(self.pier_dir, exist_ok=True)
+            return None
+
+        return os.path.join(self.data_dir, *PierLayout.relocate(parts, self.prefix, self.patp))
+
@@ -0,0 +1,122 @@
+# Python
+import os
+import string
+import secrets
+import hashlib
+from time import time
+from threading import Lock
+
+# GroundSeg modules
+from log import Log
+from config_store import ConfigStore
+
+class SessionStore:
+
+    # Sessions end after 30 days, or 7 days without use
+    ttl = 30 * 24 * 3600
+    idle = 7 * 24 * 3600
+
+    # last_seen is only written back this often
+    touch_interval = 3600
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+
+        # sha256(token): {"created", "last_seen", "agent", "addr"}
+        self._sessions = {}
+
+        try:
+            if os.path.isfile(path):
+                self._sessions = ConfigStore.load(path)
+        except Exception as e:
+            Log.log(f"Login: Failed to load sessions: {e}")
+
+        self.prune()
+
+    def hash(token):
+        return hashlib.sha256(str(token).encode('utf-8')).hexdigest()
+
+    # New session, only its hash is kept
+    def create(self, agent='', addr=''):
+        token = ''.join(secrets.choice(
+            string.ascii_uppercase +
+            string.ascii_lowercase +
+            string.digits) for i in range(64))
+
+        now = time()
+        with self._lock:
+            self._sessions[SessionStore.hash(token)] = {
+                    "created": now,
+                    "last_seen": now,
+                    "agent": agent,
+                    "addr": addr
+                    }
+            self.save()
+
+        return token
+
+    # Imports raw session ids kept in system.json by older versions
+    def migrate(self, tokens):
+        now = time()
+        with self._lock:
+            for token in tokens:
+                self._sessions.setdefault(SessionStore.hash(token), {
+                    "created": now,
+                    "last_seen": now,
+                    "agent": "",
+                    "addr": ""
+                    })
+            self.save()
+        Log.log(f"Login: Migrated {len(tokens)} sessions out of system.json")
+
+    def verify(self, token):
+        if not token:
+            return False
+
+        key = SessionStore.hash(token)
+        now = time()
+        with self._lock:
+            s = self._sessions.get(key)
+            if not s:
+                return False
+
+            if self.expired(s, now):
+                self._sessions.pop(key)
+                self.save()
+                return False
+
+            if now - s['last_seen'] > self.touch_interval:
+                s['last_seen'] = now
+                self.save()
+
+        return True
+
+    def remove(self, token):
+        with self._lock:
+            self._sessions.pop(SessionStore.hash(token), None)
+            self.save()
+
+    def clear(self):
+        with self._lock:
+            self._sessions = {}
+            self.save()
+
+    def count(self):
+        return len(self._sessions)
+
+    def prune(self):
+        now = time()
+        with self._lock:
+            expired = [k for k, s in self._sessions.items() if self.expired(s, now)]
+            for k in expired:
+                self._sessions.pop(k)
+            if len(expired) > 0:
+                Log.log(f"Login: Removed {len(expired)} expired sessions")
+                self.save()
+
+    def expired(self, s, now):
+        return now - s['created'] > self.ttl or now - s['last_seen'] > self.idle
+
+    def save(self):
+        ConfigStore.save(self.path, self._sessions)
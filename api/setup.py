@@ -1,7 +1,7 @@
 from utils import Utils
 
 class Setup:
-    def handle_anchor(data, config, wg, urbit, minio):
+    def handle_anchor(data, config, wg, urbit, minio, register):
         # set endpoint
         if 'skip' in data:
             config.config['firstBoot'] = False
@@ -20,8 +20,7 @@ class Setup:
                 config.config['wgRegistered'] = True
                 config.config['wgOn'] = True
 
-                for patp in config.config['piers']:
-                    urbit.register_urbit(patp, url)
+                register(url)
 
                 config.config['firstBoot'] = False
                 if config.save_config():
@@ -0,0 +1,219 @@
+# Python
+import time
+import random
+import requests
+from threading import Lock
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+# GroundSeg modules
+from log import Log
+
+class StarTramError(Exception):
+    pass
+
+class StarTramClient:
+
+    _headers = {"Content-Type": "application/json"}
+
+    # (connect, read) seconds per endpoint
+    timeouts = {
+            "register": (5, 30),
+            "retrieve": (5, 15),
+            "create": (5, 30),
+            "create/alias": (5, 15),
+            "delete": (5, 15),
+            "stripe/cancel": (5, 30)
+            }
+    default_timeout = (5, 15)
+
+    # Not safe to send twice, only retried when the request never got through
+    non_idempotent = ("create", "register")
+
+    # Backoff is base * 2^attempt up to cap, with up to half of it as jitter
+    backoff_base = 1
+    backoff_cap = 30
+
+    # Consecutive failed calls to an endpoint that open its circuit, and seconds it stays open
+    breaker_threshold = 5
+    breaker_cooldown = 30
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.session.headers.update(self._headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = Lock()
+
+        # endpoint: {"failures", "open_until"}
+        self._breakers = {}
+
+        # endpoint: {"calls", "failures", "retries", "latency_total", "latency_max", "last_error"}
+        self._metrics = {}
+
+    def get(self, url, endpoint, params=None, retries=3):
+        return self.request("GET", url, endpoint, params=params, retries=retries)
+
+    def post(self, url, endpoint, data, retries=3):
+        return self.request("POST", url, endpoint, json=data, retries=retries)
+
+    def delete(self, url, endpoint, data, retries=3):
+        return self.request("DELETE", url, endpoint, json=data, retries=retries)
+
+    # Parsed json response, raises StarTramError once retries run out
+    def request(self, method, url, endpoint, json=None, params=None, retries=3):
+        timeout = self.timeouts.get(endpoint, self.default_timeout)
+        error = None
+        for attempt in range(retries + 1):
+            self.check_breaker(endpoint)
+            if attempt > 0:
+                self.metric(endpoint, 'retries')
+                time.sleep(self.backoff(attempt - 1))
+
+            start = time.monotonic()
+            status = None
+            try:
+                res = self.session.request(method, f"{url}/{endpoint}",
+                                           json=json, params=params, timeout=timeout)
+                # Overloaded or down, worth another try
+                status = res.status_code
+                if status >= 500 or status == 429:
+                    raise StarTramError(f"/{endpoint} returned {status}")
+
+                body = res.json()
+                self.success(endpoint, time.monotonic() - start)
+                return body
+
+            except ValueError as e:
+                # Answered, but not with json, retrying won't change that
+                self.failure(endpoint, time.monotonic() - start, e)
+                self.trip(endpoint)
+                raise StarTramError(f"/{endpoint} returned invalid json: {e}")
+
+            except (requests.exceptions.RequestException, StarTramError) as e:
+                error = e
+                self.failure(endpoint, time.monotonic() - start, e)
+                Log.log(f"Anchor: /{endpoint} attempt {attempt + 1} failed: {e}")
+
+                # It may have been acted on already, sending it again could do it twice
+                if endpoint in self.non_idempotent and not self.not_sent(e, status):
+                    break
+
+        # The whole call counts once, a caller's own retries can't open the circuit
+        self.trip(endpoint)
+        raise StarTramError(f"/{endpoint} failed after {attempt + 1} attempts: {error}")
+
+    # The request never reached StarTram, or was turned away before being handled
+    def not_sent(self, error, status):
+        if status == 429:
+            return True
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(error, requests.exceptions.ConnectionError) and len(error.args) > 0:
+            # Refused, unresolvable and connect timeouts, not a connection dropped mid-request
+            return isinstance(getattr(error.args[0], 'reason', None), ConnectTimeoutError)
+        return False
+
+    def backoff(self, attempt):
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    # Fails fast while an endpoint is known to be down, one call gets through after the cooldown
+    def check_breaker(self, endpoint):
+        with self._lock:
+            b = self._breaker(endpoint)
+            if b['failures'] < self.breaker_threshold:
+                return
+
+            now = time.monotonic()
+            if now < b['open_until']:
+                self._metric(endpoint, 'rejected')
+                raise StarTramError(f"Circuit open for {round(b['open_until'] - now)}s, skipping /{endpoint}")
+
+            # Half open, the next failure reopens it
+            b['open_until'] = now + self.breaker_cooldown
+
+    def success(self, endpoint, latency):
+        with self._lock:
+            b = self._breaker(endpoint)
+            if b['failures'] >= self.breaker_threshold:
+                Log.log(f"Anchor: /{endpoint} is reachable again, closing its circuit")
+            b['failures'] = 0
+            b['open_until'] = 0
+            self._latency(endpoint, latency)
+
+    # One failed attempt
+    def failure(self, endpoint, latency, error):
+        with self._lock:
+            self._latency(endpoint, latency)
+            self._metric(endpoint, 'failures')
+            self._metrics[endpoint]['last_error'] = str(error)
+
+    # One failed call, after its retries
+    def trip(self, endpoint):
+        with self._lock:
+            b = self._breaker(endpoint)
+            b['failures'] += 1
+            if b['failures'] == self.breaker_threshold:
+                Log.log(f"Anchor: {b['failures']} failed calls to /{endpoint}, opening its circuit for {self.breaker_cooldown}s")
+                b['open_until'] = time.monotonic() + self.breaker_cooldown
+
+    def _breaker(self, endpoint):
+        return self._breakers.setdefault(endpoint, {"failures": 0, "open_until": 0})
+
+    def _circuit(self, endpoint, now):
+        b = self._breaker(endpoint)
+        if b['failures'] < self.breaker_threshold:
+            return "closed"
+        return "open" if now < b['open_until'] else "half-open"
+
+    def metric(self, endpoint, key):
+        with self._lock:
+            self._metric(endpoint, key)
+
+    def _metric(self, endpoint, key, n=1):
+        m = self._metrics.setdefault(endpoint, {
+            "calls": 0,
+            "failures": 0,
+            "retries": 0,
+            "rejected": 0,
+            "latency_total": 0,
+            "latency_max": 0,
+            "last_error": None
+            })
+        m[key] += n
+        return m
+
+    def _latency(self, endpoint, latency):
+        m = self._metric(endpoint, 'calls')
+        m['latency_total'] += latency
+        m['latency_max'] = max(m['latency_max'], latency)
+
+    # Call counts, latencies and circuit state per endpoint.
+    # The overall circuit is the worst of them
+    def metrics(self):
+        with self._lock:
+            now = time.monotonic()
+            endpoints = {}
+            for e, m in self._metrics.items():
+                endpoints[e] = {
+                        "circuit": self._circuit(e, now),
+                        "calls": m['calls'],
+                        "failures": m['failures'],
+                        "retries": m['retries'],
+                        "rejected": m['rejected'],
+                        "latency_avg": round(m['latency_total'] / m['calls'], 3) if m['calls'] else 0,
+                        "latency_max": round(m['latency_max'], 3),
+                        "last_error": m['last_error']
+                        }
+
+            states = [m['circuit'] for m in endpoints.values()]
+            state = "closed"
+            for worst in ("open", "half-open"):
+                if worst in states:
+                    state = worst
+                    break
+
+            return {"circuit": state, "endpoints": endpoints}
@@ -2,19 +2,19 @@
 import subprocess
 
 # Modules
-import docker
 import nmcli
 
 # GroundSeg modules
 from log import Log
+from container_state import ContainerState
 
 class SysGet:
     def get_containers():
         containers = ['groundseg']
         try:
-            for c in docker.from_env().containers.list():
-                if c.name != 'groundseg-webui' and c.name != 'minio_client':
-                    containers.append(c.name)
+            for name in ContainerState.running():
+                if name != 'groundseg-webui' and name != 'minio_client':
+                    containers.append(name)
         except Exception as e:
             Log.log(f"System: Get container list failed: {e}")
 
@@ -16,11 +16,14 @@ class SysMonitor:
         error_time = 15
         while not self.mode == "vm":
             try:
-                self.config_object._ram = psutil.virtual_memory().percent
+                mem = psutil.virtual_memory()
+                self.config_object._ram = mem.percent
+                self.config_object._ram_avail = mem.available
                 sleep(1)
                 error_time = 15
             except Exception as e:
                 self.config_object._ram = 0.0
+                self.config_object._ram_avail = None
                 Log.log(f"Monitor: RAM info error: {e}")
                 Log.log(f"Monitor: Checking RAM info again in {error_time} seconds")
                 sleep(error_time)
@@ -11,14 +11,12 @@ from log import Log
 class SysPost:
     def handle_session(data, config, sid):
         if data['action'] == 'logout':
-            config.config['sessions'] = [i for i in config.config['sessions'] if i != sid]
-            config.save_config()
+            config.sessions.remove(sid)
             Log.log(f"Login: Logging out off current session: {sid}")
             return 200
 
         if data['action'] == 'logout-all':
-            config.config['sessions'] = []
-            config.save_config()
+            config.sessions.clear()
             Log.log("Login: Logging out off all sessions")
             return 200
 
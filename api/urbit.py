@@ -1,27 +1,32 @@
 # Python
 import os
+import re
 import copy
-import time
 import json
+import time
 import socket
 import shutil
 import string
 import secrets
 import zipfile
-import tarfile
 
-from io import BytesIO
 from time import sleep
-from pathlib import Path
 from datetime import datetime
-
-# Flask
-from flask import send_file
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # GroundSeg Modules
 from log import Log
+from config_store import ConfigStore
 from utils import Utils
 from urbit_docker import UrbitDocker
+from archive_export import ArchiveExport
+from container_state import ContainerState
+from lens_client import LensClient
+from extract_progress import ExtractProgress
+from parallel_extract import ParallelExtract
+from pier_layout import PierLayout
+from pier_stream import PierStream
+from melder import Melder
 
 default_pier_config = {
         "pier_name":"",
@@ -69,7 +74,11 @@ class Urbit:
         self.minio = minio
 
         self.urb_docker = UrbitDocker()
+        self.lens = LensClient(self.urb_docker, self._volume_directory)
+        self.exporter = ArchiveExport(self.config_object.base_path)
         self._urbits = {}
+        self._lens_addr = {}
+        ContainerState.subscribe(self.container_changed)
 
         branch = self.config['updateBranch']
 
@@ -117,7 +126,10 @@ class Urbit:
                 self.config_object.save_config()
 
                 Log.log(f"{patp}: Removing {patp}.json")
+                ConfigStore.discard(f"{self.config_object.base_path}/settings/pier/{patp}.json")
                 os.remove(f"/opt/nativeplanet/groundseg/settings/pier/{patp}.json")
+                self.exporter.remove(patp)
+                self.exporter.remove(f"bucket_{patp}")
 
                 self._urbits.pop(patp)
                 Log.log(f"{patp}: Data removed from GroundSeg")
@@ -129,32 +141,18 @@ class Urbit:
 
         return 400
 
-    def export(self, patp):
+    def export(self, patp, codec='deflate'):
         Log.log(f"{patp}: Attempting to export pier")
         c = self.urb_docker.get_container(patp)
         if c:
             if c.status == "running":
                 self.stop(patp)
 
-            file_name = f"{patp}.zip"
-            memory_file = BytesIO()
-            file_path=f"{self._volume_directory}/{patp}/_data/"
+            file_path = f"{self._volume_directory}/{patp}/_data"
+            Log.log(f"{patp}: Compressing pier ({codec})")
+            return self.exporter.export(patp, file_path, codec, skip=['conn.sock'])
 
-            Log.log(f"{patp}: Compressing pier")
-
-            with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(file_path):
-                    arc_dir = root[root.find("_data/")+6:]
-                    for file in files:
-                        if file != 'conn.sock':
-                            zipf.write(os.path.join(root, file), arcname=os.path.join(arc_dir,file))
-                        else:
-                            Log.log(f"{patp}: Skipping {file} while compressing")
-
-            memory_file.seek(0)
-
-            Log.log(f"{patp}: Pier successfully exported")
-            return send_file(memory_file, download_name=file_name, as_attachment=True)
+        return 400
 
     # Start all valid containers
     def start_all(self, patps):
@@ -164,20 +162,40 @@ class Urbit:
             Log.log(f"Urbit: No ships detected in system.json! Skipping..")
             return True
 
-        for p in patps:
-            status = self.start(p)
-            try:
-                res[status].append(p)
-            except Exception as e:
-                Log.log(f"{p}: {e}")
+        began = time.time()
+
+        # MinIO and remote ships join the wireguard container's network
+        if self.config['wgOn'] and self.config['wgRegistered']:
+            if not self.wg.is_running():
+                self.wg.start()
+
+        workers = max(1, min(int(self.config['startWorkers']), len(patps)))
+        Log.log(f"Urbit: Starting {len(patps)} ships with {workers} workers")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self.timed_start, p): p for p in patps}
+            for f in as_completed(futures):
+                p = futures[f]
+                try:
+                    status, taken = f.result()
+                    res[status].append(f"{p} ({taken:.1f}s)")
+                except Exception as e:
+                    Log.log(f"{p}: {e}")
 
         Log.log(f"Urbit: Start succeeded {res['succeeded']}")
         Log.log(f"Urbit: Start ignored {res['ignored']}")
         Log.log(f"Urbit: Start failed {res['failed']}")
         Log.log(f"Urbit: Patp invalid {res['invalid']}")
+        Log.log(f"Urbit: Started all ships in {time.time() - began:.1f}s")
 
         return True
 
+    # Start a ship and report how long it took
+    def timed_start(self, patp):
+        began = time.time()
+        status = self.start(patp)
+        return status, time.time() - began
+
     # Return list of ship information
     def list_ships(self):
         urbits = []
@@ -186,11 +204,11 @@ class Urbit:
                 for patp in self.config['piers']:
                     try:
                         u = dict()
-                        c = self.urb_docker.get_container(patp)
-                        if c:
+                        status = self.urb_docker.get_status(patp)
+                        if status:
                             cfg = self._urbits[patp]
                             u['name'] = patp
-                            u['running'] = c.status == "running"
+                            u['running'] = status == "running"
                             u['url'] = f'http://{socket.gethostname()}.local:{cfg["http_port"]}'
                             u['remote'] = False
 
@@ -274,107 +292,47 @@ class Urbit:
 
         try:
             # Remove directory and make new empty one
-            self.config_object.upload_status[patp] = {'status':'setup'}
-            Log.log(f"{patp}: Removing existing volume")
-            shutil.rmtree(f"{vol_dir}", ignore_errors=True)
-            Log.log(f"{patp}: Creating volume directory")
-            os.system(f'mkdir -p {vol_dir}/_data')
+            self.reset_volume(patp)
 
             # Begin extraction
             Log.log(f"{patp}: Extracting {filename}")
+            data_dir = f"{vol_dir}/_data"
 
-            # Zipfile
+            # Zipfile, the layout comes from the central directory
             if filename.endswith("zip"):
+                layout = PierLayout(patp, ParallelExtract.zip_names(compressed_dir))
+                err = layout.error()
+                if err:
+                    return err
+
                 with zipfile.ZipFile(compressed_dir) as zip_ref:
-                    total_size = sum((file.file_size for file in zip_ref.infolist()))
-                    self.config_object.upload_status[patp] = {
-                            'status':'extracting',
-                            'progress':{
-                                'current':0,
-                                'total': total_size
-                                }
-                            }
-                    zip_ref.extractall(f"{vol_dir}/_data")
-
-            # Tarball
+                    total_size = sum((m.file_size for m in zip_ref.infolist()))
+                progress = ExtractProgress(total_size)
+                self.config_object.upload_status[patp] = {'status':'extracting','counter':progress}
+                ParallelExtract.extract_zip(compressed_dir, data_dir, progress, layout.destination)
+
+            # Tarball, decompressed once with the layout worked out as members stream by
             elif filename.endswith("tar.gz") or filename.endswith("tgz") or filename.endswith("tar"):
-                with tarfile.open(compressed_dir, "r:gz") as tar_ref:
-                    total_size = sum((member.size for member in tar_ref.getmembers()))
-                    self.config_object.upload_status[patp] = {
-                            'status':'extracting',
-                            'progress':{
-                                'current':0,
-                                'total': total_size
-                                }
-                            }
-                    tar_ref.extractall(f"{vol_dir}/_data")
+                stream = PierStream(patp, filename, data_dir, os.path.getsize(compressed_dir))
+                self.config_object.upload_status[patp] = {'status':'extracting','counter':stream.progress}
+                try:
+                    with open(compressed_dir, 'rb') as f:
+                        offset = 0
+                        while chunk := f.read(1024 * 1024):
+                            stream.write(offset, chunk)
+                            offset += len(chunk)
+                except Exception as e:
+                    # Extractor stopped reading, finish() has its error
+                    Log.log(f"{patp}: Extraction stopped early: {e}")
+
+                err = stream.finish()
+                if err:
+                    return err
 
         except Exception as e:
             Log.log(f"{patp}: Failed to extract {filename}: {e}")
             return "File extraction failed"
 
-        # Restructure directory
-        try:
-            # Get all .urb locations in directory
-            data_dir = os.path.join(vol_dir, '_data')
-            urb_loc = []
-            for root, dirs, files in os.walk(data_dir):
-                if '.urb' in dirs:
-                    urb_loc.append(root)
-
-            # Fail if more than one .urb exists
-            if len(urb_loc) > 1:
-                Log.log(f"{patp}: Multiple ships ({len(urb_loc)}) detected in pier directory")
-                return "Multiple ships detected in pier directory"
-            if len(urb_loc) < 1:
-                Log.log(f"{patp}: No ships detected in pier directory")
-                return "No Urbit ship found in pier directory"
-
-            Log.log(f"{patp}: .urb subdirectory in {urb_loc[0]}")
-
-            pier_dir = os.path.join(data_dir, patp)
-            temp_dir = os.path.join(data_dir, 'temp_dir')
-            unused_dir = os.path.join(data_dir, 'unused')
-
-            # check if .urb is in the correct location 
-            if os.path.join(pier_dir, '.urb') != os.path.join(urb_loc[0], '.urb'):
-                Log.log(f"{patp}: .urb location incorrect!")
-                Log.log(f"{patp}: Restructuring directory structure")
-
-                # move to temp dir
-                Log.log(f"{patp}: .urb found in {urb_loc[0]}")
-                Log.log(f"{patp}: Moving to {temp_dir}")
-                if data_dir == urb_loc[0]: # .urb in root
-                    # Create directory
-                    os.makedirs(temp_dir, exist_ok=True)
-                    # select everything in root except for pier_dir
-                    items = [x for x in list(Path(urb_loc[0]).iterdir()) if str(x) != pier_dir]
-                    Log.log(f"{patp}: Items to move: {items}")
-                    for item in items:
-                        shutil.move(str(item), temp_dir)
-                else:
-                    shutil.move(urb_loc[0], temp_dir)
-
-                # rename directories
-                unused = [str(x) for x in list(Path(data_dir).iterdir()) if (str(x) != temp_dir) and (str(x) != unused_dir)]
-                if len(unused) > 0:
-                    # Create directory
-                    os.makedirs(unused_dir, exist_ok=True)
-                    Log.log(f"{patp}: Moving unused items to {unused_dir}")
-                    for u in unused:
-                        Log.log(f"{patp}: Unused items to move: {unused}")
-                        shutil.move(u, unused_dir)
-
-                shutil.move(temp_dir, pier_dir)
-
-                Log.log(f"{patp}: Restructuring done!")
-            else:
-                Log.log(f"{patp}: No restructuring needed!")
-
-        except Exception as e:
-            Log.log(f"{patp}: Failed to restructure directory: {e}")
-            return f"Failed to restructure {patp}"
-
         try:
             self.config_object.upload_status[patp] = {'status':'cleaning'}
             shutil.rmtree(f"{self.config_object.base_path}/uploaded/{patp}", ignore_errors=True)
@@ -386,6 +344,26 @@ class Urbit:
 
         return "to-create"
 
+    # Empty volume directory for an uploaded pier
+    def reset_volume(self, patp):
+        vol_dir = f'{self._volume_directory}/{patp}'
+        self.config_object.upload_status[patp] = {'status':'setup'}
+        Log.log(f"{patp}: Removing existing volume")
+        shutil.rmtree(f"{vol_dir}", ignore_errors=True)
+        Log.log(f"{patp}: Creating volume directory")
+        os.makedirs(f"{vol_dir}/_data", exist_ok=True)
+        return f"{vol_dir}/_data"
+
+    # Boot a pier that was extracted while it was uploaded
+    def boot_streamed(self, patp):
+        Log.log(f"{patp}: Booting existing pier")
+        created = self.create_existing(patp)
+        if created != "succeeded":
+            self.config_object.upload_status.pop(patp)
+            return created
+        self.config_object.upload_status[patp] = {'status':'done'}
+        return 200
+
     # Boot the newly uploaded pier
     def create_existing(self, patp):
         Log.log(f"{patp}: Attempting to boot new urbit ship")
@@ -420,12 +398,12 @@ class Urbit:
    # Return all details of Urbit ID
     def get_info(self, patp):
         # Check if Urbit Pier exists
-        c = self.urb_docker.get_container(patp)
-        if c:
+        status = self.urb_docker.get_status(patp)
+        if status:
             # If MinIO container exists
             containers = [patp]
             has_bucket = False
-            if self.minio.minio_docker.get_container(f"minio_{patp}", False):
+            if self.minio.minio_docker.exists(f"minio_{patp}"):
                 containers.append(f"minio_{patp}")
                 has_bucket = True
 
@@ -433,7 +411,7 @@ class Urbit:
 
             urbit = {
                 "name": patp,
-                "running": c.status == "running",
+                "running": status == "running",
                 "wgReg": self.config['wgRegistered'],
                 "wgRunning": self.wg.is_running(),
                 "autostart": cfg['boot_status'] != 'off',
@@ -527,16 +505,9 @@ class Urbit:
         code = ''
         lens_addr = self.get_loopback_addr(patp)
         try:
-            f_data = {"source": {"dojo": "+code"}, "sink": {"stdout": None}}
-            with open(f'{self._volume_directory}/{patp}/_data/code.json','w') as f :
-                json.dump(f_data, f)
-
-            command = f'curl -s -X POST -H "Content-Type: application/json" -d @code.json {lens_addr}'
-            res = self.urb_docker.exec(patp, command)
-            if res:
-                code = res.output.decode('utf-8').strip().split('\\')[0][1:]
-
-            os.remove(f'{self._volume_directory}/{patp}/_data/code.json')
+            ok, out = self.lens.command(patp, lens_addr, {"dojo": "+code"}, {"stdout": None})
+            if ok:
+                code = out.strip().split('\\')[0][1:]
 
         except Exception as e:
             Log.log(f"{patp}: Failed to get +code {e}")
@@ -559,7 +530,6 @@ class Urbit:
                 else:
                     self._urbits[patp]['boot_status'] = 'off'
 
-                self.save_config(patp)
                 Log.log(f"{patp}: Boot status changed: {old_status} -> {self._urbits[patp]['boot_status']}")
                 self.save_config(patp)
                 return 200
@@ -669,6 +639,7 @@ class Urbit:
 
             Log.log(f"{patp}: Meld frequency changed: {old_sched} Days -> {self._urbits[patp]['meld_frequency']} {days}")
             self.save_config(patp)
+            Melder.wake()
 
             return 200
 
@@ -684,13 +655,8 @@ class Urbit:
             Log.log(f"{patp}: Automatic meld changed: {not self._urbits[patp]['meld_schedule']} -> {self._urbits[patp]['meld_schedule']}")
             self.save_config(patp)
 
-            try:
-                now = int(datetime.utcnow().timestamp())
-                if self._urbits[patp]['meld_schedule']:
-                    if int(self._urbits[patp]['meld_next']) <= now:
-                        self.send_pack_meld(patp)
-            except:
-                pass
+            # An overdue meld is started by the melder
+            Melder.wake()
 
         except Exception as e:
             Log.log(f"{patp}: Unable to toggle automatic meld: {e}")
@@ -708,14 +674,9 @@ class Urbit:
     def send_pack(self, patp, lens_addr):
         Log.log(f"{patp}: Attempting to send |pack")
         try:
-            data = {"source": {"dojo": "+hood/pack"}, "sink": {"app": "hood"}}
-            with open(f'{self._volume_directory}/{patp}/_data/pack.json','w') as f :
-                json.dump(data, f)
-
-            command = f'curl -s -X POST -H "Content-Type: application/json" -d @pack.json {lens_addr}'
-            res = self.urb_docker.exec(patp, command)
-            if res:
-                os.remove(f'{self._volume_directory}/{patp}/_data/pack.json')
+            ok, _ = self.lens.command(patp, lens_addr, {"dojo": "+hood/pack"}, {"app": "hood"},
+                                     timeout=LensClient.long_timeout)
+            if ok:
                 Log.log(f"{patp}: |pack sent successfully")
                 return True
 
@@ -727,14 +688,9 @@ class Urbit:
     def send_meld(self, patp, lens_addr):
         Log.log(f"{patp}: Attempting to send |meld")
         try:
-            data = {"source": {"dojo": "+hood/meld"}, "sink": {"app": "hood"}}
-            with open(f'{self._volume_directory}/{patp}/_data/meld.json','w') as f :
-                json.dump(data, f)
-
-            command = f'curl -s -X POST -H "Content-Type: application/json" -d @meld.json {lens_addr}'
-            res = self.urb_docker.exec(patp, command)
-            if res:
-                os.remove(f'{self._volume_directory}/{patp}/_data/meld.json')
+            ok, _ = self.lens.command(patp, lens_addr, {"dojo": "+hood/meld"}, {"app": "hood"},
+                                     timeout=LensClient.long_timeout)
+            if ok:
                 Log.log(f"{patp}: |meld sent successfully")
 
                 now = datetime.utcnow()
@@ -764,13 +720,19 @@ class Urbit:
 
     # Get looback address of Urbit Pier
     def get_loopback_addr(self, patp):
-        log = self.urb_docker.full_logs(patp)
-        if log:
-            log_arr = log.decode("utf-8").split('\n')[::-1]
-            substr = 'http: loopback live on'
-            for ln in log_arr:
-                if substr in ln:
-                    return str(ln.split(' ')[-1])
+        addr = self._lens_addr.get(patp)
+        if addr:
+            return addr
+
+        addr = self.urb_docker.loopback_addr(patp)
+        if addr:
+            self._lens_addr[patp] = addr
+        return addr
+
+    # Loopback address changes when the container restarts
+    def container_changed(self, name, status):
+        if self._lens_addr.pop(name, None):
+            Log.log(f"{name}: Container is now {status}, cleared loopback address")
 
     # Add urbit ship to GroundSeg
     def add_urbit(self, patp):
@@ -792,28 +754,12 @@ class Urbit:
             if self.wg.get_status(url):
                 self.wg.update_wg_config(self.wg.anchor_data['conf'])
 
-                # Define services
-                urbit_web = False
-                urbit_ames = False
-                minio_svc = False
-                minio_console = False
-                minio_bucket = False
-
                 # Check if service exists for patp
-                for ep in self.wg.anchor_data['subdomains']:
-                    ep_patp = ep['url'].split('.')[-3]
-                    ep_svc = ep['svc_type']
-                    if ep_patp == patp:
-                        if ep_svc == 'urbit-web':
-                            urbit_web = True
-                        if ep_svc == 'urbit-ames':
-                            urbit_ames = True
-                        if ep_svc == 'minio':
-                            minio_svc = True
-                        if ep_svc == 'minio-console':
-                            minio_console = True
-                        if ep_svc == 'minio-bucket':
-                            minio_bucket = True
+                urbit_web = self.wg.service(patp, 'urbit-web')
+                urbit_ames = self.wg.service(patp, 'urbit-ames')
+                minio_svc = self.wg.service(patp, 'minio')
+                minio_console = self.wg.service(patp, 'minio-console')
+                minio_bucket = self.wg.service(patp, 'minio-bucket')
  
                 # One or more of the urbit services is not registered
                 if not (urbit_web and urbit_ames):
@@ -825,41 +771,25 @@ class Urbit:
                     Log.log(f"{patp}: Registering MinIO")
                     self.wg.register_service(f's3.{patp}', 'minio', url)
 
-            svc_url = None
-            http_port = None
-            ames_port = None
-            s3_port = None
-            console_port = None
             tries = 1
-
-            while None in [svc_url,http_port,ames_port,s3_port,console_port]:
+            while True:
                 Log.log(f"{patp}: Checking anchor config if services are ready")
                 if self.wg.get_status(url):
                     self.wg.update_wg_config(self.wg.anchor_data['conf'])
 
-                Log.log(f"Anchor: {self.wg.anchor_data['subdomains']}")
-                pub_url = '.'.join(self.config['endpointUrl'].split('.')[1:])
-
-                for ep in self.wg.anchor_data['subdomains']:
-                    if ep['status'] == 'ok':
-                        if(f'{patp}.{pub_url}' == ep['url']):
-                            svc_url = ep['url']
-                            http_port = ep['port']
-                        elif(f'ames.{patp}.{pub_url}' == ep['url']):
-                            ames_port = ep['port']
-                        elif(f'bucket.s3.{patp}.{pub_url}' == ep['url']):
-                            s3_port = ep['port']
-                        elif(f'console.s3.{patp}.{pub_url}' == ep['url']):
-                            console_port = ep['port']
-                    else:
-                        t = tries * 2
-                        Log.log(f"Anchor: {ep['svc_type']} not ready. Trying again in {t} seconds.")
-                        time.sleep(t)
-                        if tries <= 15:
-                            tries = tries + 1
-                        break
+                ep = self.wg.ship_endpoints(patp)
+                if ep:
+                    break
 
-            return self.set_wireguard_network(patp, svc_url, http_port, ames_port, s3_port, console_port)
+                pending = [s for s in ['urbit-web', 'urbit-ames', 'minio-bucket', 'minio-console']
+                           if not self.wg.service_ready(patp, s)]
+                t = tries * 2
+                Log.log(f"Anchor: {', '.join(pending)} not ready. Trying again in {t} seconds.")
+                time.sleep(t)
+                if tries <= 15:
+                    tries = tries + 1
+
+            return self.set_wireguard_network(patp, ep['url'], ep['http_port'], ep['ames_port'], ep['s3_port'], ep['console_port'])
 
         return True
 
@@ -910,39 +840,96 @@ class Urbit:
         return 400
 
     def set_minio_endpoint(self, patp, endpoint, access_key, secret, bucket, lens_addr):
-        self.send_poke(patp, 'set-endpoint', endpoint, lens_addr)
-        self.send_poke(patp, 'set-access-key-id', access_key, lens_addr)
-        self.send_poke(patp, 'set-secret-access-key', secret, lens_addr)
-        self.send_poke(patp, 'set-current-bucket', bucket, lens_addr)
+        pokes = [('set-endpoint', endpoint),
+                 ('set-access-key-id', access_key),
+                 ('set-secret-access-key', secret),
+                 ('set-current-bucket', bucket)]
+
+        # What the ship has now is read in the same batch, a failed update puts it back
+        res, prior = self.send_pokes(patp, pokes, lens_addr, read_prior=True)
+        if all(res.values()):
+            return 200
 
-        return 200
+        # Don't leave the ship with half of the new credentials
+        sent = [cmd for cmd, ok in res.items() if ok]
+        if len(sent) > 0:
+            if prior == None:
+                Log.log(f"{patp}: Previous S3 settings unknown, unable to roll back {sent}")
+            else:
+                Log.log(f"{patp}: Rolling back {sent}")
+                rollback = self.send_pokes(patp, [(cmd, prior[cmd]) for cmd in sent], lens_addr)
+                failed = [cmd for cmd, ok in rollback.items() if not ok]
+                if len(failed) > 0:
+                    Log.log(f"{patp}: Rollback failed for {failed}, S3 settings are inconsistent")
+
+        return 400
+
+    # s3-store's credentials and configuration as hex encoded json, so dojo's printing can't mangle it
+    _s3_scry = {"dojo": "(en:base16:mimes:html (as-octs:mimes:html (en:json:html (pairs:enjs:format ~[['c' .^(json %gx /=s3-store=/credentials/json)] ['g' .^(json %gx /=s3-store=/configuration/json)]]))))"}
+
+    # Settings as {poke: value} from the scry's output, None if it can't be read
+    def parse_s3_settings(self, patp, out):
+        try:
+            blob = json.loads(bytes.fromhex(max(re.findall(r'[0-9a-fA-F]+', out), key=len)))
+            creds = blob['c']['credentials']
+            conf = blob['g']['configuration']
+            return {
+                    "set-endpoint": creds['endpoint'],
+                    "set-access-key-id": creds['accessKeyId'],
+                    "set-secret-access-key": creds['secretAccessKey'],
+                    "set-current-bucket": conf['currentBucket']
+                    }
+
+        except Exception as e:
+            Log.log(f"{patp}: Failed to read S3 settings: {e}")
+
+        return None
 
     def unlink_minio_endpoint(self, patp, lens_addr):
-        self.send_poke(patp, 'set-endpoint', '', lens_addr)
-        self.send_poke(patp, 'set-access-key-id', '', lens_addr)
-        self.send_poke(patp, 'set-secret-access-key', '', lens_addr)
-        self.send_poke(patp, 'set-current-bucket', '', lens_addr)
+        pokes = [('set-endpoint', ''),
+                 ('set-access-key-id', ''),
+                 ('set-secret-access-key', ''),
+                 ('set-current-bucket', '')]
 
-        return 200
+        res = self.send_pokes(patp, pokes, lens_addr)
+        if all(res.values()):
+            return 200
+
+        return 400
 
-    def send_poke(self, patp, command, data, lens_addr):
-        Log.log(f"{patp}: Attempting to send {command} poke")
+    # Send s3-store pokes as a single lens batch, returns {command: success}.
+    # With read_prior the settings from before the pokes come back too, as (results, prior)
+    def send_pokes(self, patp, pokes, lens_addr, read_prior=False):
+        Log.log(f"{patp}: Attempting to send {[cmd for cmd, _ in pokes]} pokes")
+        res = {cmd: False for cmd, _ in pokes}
+        prior = None
         try:
-            data = {"source": {"dojo": f"+landscape!s3-store/{command} '{data}'"}, "sink": {"app": "s3-store"}}
-            with open(f'{self._volume_directory}/{patp}/_data/{command}.json','w') as f :
-                json.dump(data, f)
-
-            cmd = f'curl -s -X POST -H "Content-Type: application/json" -d @{command}.json {lens_addr}'
-            res = self.urb_docker.exec(patp, cmd)
-            if res:
-                os.remove(f'{self._volume_directory}/{patp}/_data/{command}.json')
-                Log.log(f"{patp}: {command} sent successfully")
-                return True
+            payloads = [{"source": {"dojo": f"+landscape!s3-store/{cmd} {Urbit.cord(data)}"},
+                         "sink": {"app": "s3-store"}} for cmd, data in pokes]
+            if read_prior:
+                payloads.insert(0, {"source": self._s3_scry, "sink": {"stdout": None}})
+
+            results = self.lens.batch(patp, lens_addr, payloads)
+            if read_prior:
+                ok, out = results.pop(0)
+                if ok:
+                    prior = self.parse_s3_settings(patp, out)
+
+            for (cmd, _), (ok, _) in zip(pokes, results):
+                res[cmd] = ok
+
+            Log.log(f"{patp}: Poke results: {res}")
 
         except Exception as e:
-            Log.log(f"{patp}: Failed to send {command}: {e}")
+            Log.log(f"{patp}: Failed to send pokes: {e}")
 
-        return False
+        if read_prior:
+            return res, prior
+        return res
+
+    # Hoon cord literal, ' and \ escaped
+    def cord(text):
+        return "'" + str(text).replace('\\', '\\\\').replace("'", "\\'") + "'"
 
     def update_wireguard_network(self, patp, url, http_port, ames_port, s3_port, console_port, alias):
         Log.log(f"{patp}: Attempting to update wireguard network")
@@ -1112,38 +1099,38 @@ class Urbit:
 
     def load_config(self, patp):
         try:
-            with open(f"{self.config_object.base_path}/settings/pier/{patp}.json") as f:
-                cfg = json.load(f)
-                self._urbits[patp] = {**default_pier_config, **cfg}
+            cfg = ConfigStore.load(f"{self.config_object.base_path}/settings/pier/{patp}.json")
+            self._urbits[patp] = {**default_pier_config, **cfg}
 
-                # Updater Urbit information
-                try:
-                    if (self.config_object.update_avail) and (self.config['updateMode'] == 'auto'):
+            # Updater Urbit information
+            try:
+                if (self.config_object.update_avail) and (self.config['updateMode'] == 'auto'):
+                    old = dict(self._urbits[patp])
+                    self._urbits[patp]['urbit_repo'] = self.updater_info['repo']
+                    self._urbits[patp]['urbit_version'] = self.updater_info['tag']
+                    self._urbits[patp]['urbit_amd64_sha256'] = self.updater_info['amd64_sha256']
+                    self._urbits[patp]['urbit_arm64_sha256'] = self.updater_info['arm64_sha256']
+                    self._urbits[patp]['minio_repo'] = self.updater_minio['repo']
+                    self._urbits[patp]['minio_version'] = self.updater_minio['tag']
+                    self._urbits[patp]['minio_amd64_sha256'] = self.updater_minio['amd64_sha256']
+                    self._urbits[patp]['minio_arm64_sha256'] = self.updater_minio['arm64_sha256']
+
+                    # Only written when the version server changed something
+                    if self._urbits[patp] != old:
                         Log.log(f"{patp}: Replacing local data with version server data")
-                        self._urbits[patp]['urbit_repo'] = self.updater_info['repo']
-                        self._urbits[patp]['urbit_version'] = self.updater_info['tag']
-                        self._urbits[patp]['urbit_amd64_sha256'] = self.updater_info['amd64_sha256']
-                        self._urbits[patp]['urbit_arm64_sha256'] = self.updater_info['arm64_sha256']
-                        self._urbits[patp]['minio_repo'] = self.updater_minio['repo']
-                        self._urbits[patp]['minio_version'] = self.updater_minio['tag']
-                        self._urbits[patp]['minio_amd64_sha256'] = self.updater_minio['amd64_sha256']
-                        self._urbits[patp]['minio_arm64_sha256'] = self.updater_minio['arm64_sha256']
                         self.save_config(patp)
-                except:
-                    pass
+            except:
+                pass
 
-                Log.log(f"{patp}: Config loaded")
-                return True
+            Log.log(f"{patp}: Config loaded")
+            return True
         except Exception as e:
             Log.log(f"{patp}: Failed to load config: {e}")
             return False
 
     def save_config(self, patp):
         try:
-            with open(f"{self.config_object.base_path}/settings/pier/{patp}.json", "w") as f:
-                json.dump(self._urbits[patp], f, indent = 4)
-                Log.log(f"{patp}: Config saved")
-                return True
+            return ConfigStore.save(f"{self.config_object.base_path}/settings/pier/{patp}.json", self._urbits[patp])
         except Exception as e:
             Log.log(f"{patp}: Failed to save config: {e}")
             return False
@@ -1,14 +1,22 @@
+# Python
+from datetime import datetime, timezone
+
 # Modules
 import docker
 
 # GroundSeg modules
 from utils import Utils
 from log import Log
+from container_state import ContainerState
+from image_pull import ImagePull
 
 client = docker.from_env()
 
 class UrbitDocker:
 
+    # Log lines read when the container start time is unknown
+    _lens_tail = 5000
+
     def start(self, config, arch, vol_dir, key=''):
         patp = config['pier_name']
         tag = config['urbit_version']
@@ -57,6 +65,7 @@ class UrbitDocker:
                 f.write(script)
                 f.close()
             c.start()
+            ContainerState.set_status(patp, "running")
             Log.log(f"{patp}: Successfully started container")
             return "succeeded"
         except Exception as e:
@@ -69,6 +78,7 @@ class UrbitDocker:
         if c:
             try:
                 c.stop()
+                ContainerState.set_status(patp, "exited")
             except Exception as e:
                 Log.log(f"{patp}: Failed to stop container")
                 return False
@@ -76,6 +86,18 @@ class UrbitDocker:
         Log.log(f"{patp}: Container stopped")
         return True
 
+    # Status from the container state index, None if container doesn't exist
+    def get_status(self, patp):
+        return ContainerState.status(patp)
+
+    # Container memory use in bytes, None if it can't be read
+    def memory_usage(self, patp):
+        try:
+            stats = client.api.stats(patp, stream=False)
+            return stats['memory_stats'].get('usage')
+        except Exception:
+            return None
+
     def get_container(self, patp):
         try:
             c = client.containers.get(patp)
@@ -149,6 +171,39 @@ class UrbitDocker:
             return False
         return c.logs()
 
+    # Read the current run's logs until the loopback address shows up
+    def loopback_addr(self, patp):
+        c = self.get_container(patp)
+        if not c:
+            return None
+
+        substr = b'http: loopback live on'
+        try:
+            started = c.attrs['State']['StartedAt'][:19]
+            since = int(datetime.fromisoformat(started).replace(tzinfo=timezone.utc).timestamp())
+            stream = c.logs(stream=True, since=since)
+        except Exception as e:
+            Log.log(f"{patp}: Unable to get container start time: {e}")
+            stream = c.logs(stream=True, tail=self._lens_tail)
+
+        try:
+            buf = b''
+            for chunk in stream:
+                buf += chunk
+                lines = buf.split(b'\n')
+                buf = lines.pop()
+                for ln in lines:
+                    if substr in ln:
+                        return ln.decode('utf-8').strip().split(' ')[-1]
+
+            if substr in buf:
+                return buf.decode('utf-8').strip().split(' ')[-1]
+
+        finally:
+            stream.close()
+
+        return None
+
     def exec(self, patp, command):
         c = self.get_container(patp)
         if c:
@@ -156,18 +211,13 @@ class UrbitDocker:
                 res = c.exec_run(command)
                 return res
             except Exception as e:
-                Log.log(f"{patp}: Unable to exec {command}: {e}")
+                # The command itself isn't logged, it can carry credentials
+                Log.log(f"{patp}: Unable to exec command: {e}")
 
         return False
 
     def _pull_image(self, image, patp):
-        try:
-            Log.log(f"{patp}: Pulling {image}")
-            client.images.pull(image)
-            return True
-        except Exception as e:
-            Log.log(f"{patp}: Failed to pull {image}: {e}")
-            return False
+        return ImagePull.pull(client, image, patp)
 
     def _get_volume(self, patp):
         try:
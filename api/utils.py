@@ -13,8 +13,28 @@ from cryptography.hazmat.primitives import serialization, hashes
 
 # GroundSeg modules
 from log import Log
+from patp import Patp
 
 class Utils:
+    # Serve a Flask app, waitress has a fixed thread pool and keep-alive
+    def serve(app, port, config_object):
+        config = config_object.config
+        debug_mode = config_object.debug_mode
+        if config['webServer'] == 'waitress' and not debug_mode:
+            try:
+                import waitress
+                Log.log(f"Server: Starting waitress on port {port} with {config['webThreads']} threads")
+                waitress.serve(app, host='0.0.0.0', port=port,
+                      threads=int(config['webThreads']),
+                      channel_timeout=int(config['webTimeout']),
+                      ident='GroundSeg')
+                return
+            except ImportError:
+                Log.log("Server: waitress is not installed, using the Flask server")
+
+        Log.log(f"Server: Starting Flask server on port {port}")
+        app.run(host='0.0.0.0', port=port, threaded=True, debug=debug_mode, use_reloader=False)
+
     def make_hash(file):
         h  = hashlib.sha256()
         b  = bytearray(128*1024)
@@ -25,44 +45,7 @@ class Utils:
         return h.hexdigest()
 
     def check_patp(patp):
-        # Make sure patp is string
-        if type(patp) != str:
-            return False
-
-        # Remove sig from patp
-        if patp.startswith("~"):
-            patp = patp[1:]
-
-        # patps cannot start with doz
-        if patp.startswith("doz"):
-            return False
-
-        # valid
-        pre = "dozmarbinwansamlitsighidfidlissogdirwacsabwissibrigsoldopmodfoglidhopdardorlorhodfolrintogsilmirholpaslacrovlivdalsatlibtabhanticpidtorbolfosdotlosdilforpilramtirwintadbicdifrocwidbisdasmidloprilnardapmolsanlocnovsitnidtipsicropwitnatpanminritpodmottamtolsavposnapnopsomfinfonbanmorworsipronnorbotwicsocwatdolmagpicdavbidbaltimtasmalligsivtagpadsaldivdactansidfabtarmonranniswolmispallasdismaprabtobrollatlonnodnavfignomnibpagsopralbilhaddocridmocpacravripfaltodtiltinhapmicfanpattaclabmogsimsonpinlomrictapfirhasbosbatpochactidhavsaplindibhosdabbitbarracparloddosbortochilmactomdigfilfasmithobharmighinradmashalraglagfadtopmophabnilnosmilfopfamdatnoldinhatnacrisfotribhocnimlarfitwalrapsarnalmoslandondanladdovrivbacpollaptalpitnambonrostonfodponsovnocsorlavmatmipfip"
-        suf = "zodnecbudwessevpersutletfulpensytdurwepserwylsunrypsyxdyrnuphebpeglupdepdysputlughecryttyvsydnexlunmeplutseppesdelsulpedtemledtulmetwenbynhexfebpyldulhetmevruttylwydtepbesdexsefwycburderneppurrysrebdennutsubpetrulsynregtydsupsemwynrecmegnetsecmulnymtevwebsummutnyxrextebfushepbenmuswyxsymselrucdecwexsyrwetdylmynmesdetbetbeltuxtugmyrpelsyptermebsetdutdegtexsurfeltudnuxruxrenwytnubmedlytdusnebrumtynseglyxpunresredfunrevrefmectedrusbexlebduxrynnumpyxrygryxfeptyrtustyclegnemfermertenlusnussyltecmexpubrymtucfyllepdebbermughuttunbylsudpemdevlurdefbusbeprunmelpexdytbyttyplevmylwedducfurfexnulluclennerlexrupnedlecrydlydfenwelnydhusrelrudneshesfetdesretdunlernyrsebhulrylludremlysfynwerrycsugnysnyllyndyndemluxfedsedbecmunlyrtesmudnytbyrsenwegfyrmurtelreptegpecnelnevfes"
-
-        # convert to array
-        pre = [pre[i:i+3] for i in range(0, len(pre), 3)]
-        suf = [suf[i:i+3] for i in range(0, len(suf), 3)]
-
-        # Galaxy check
-        if len(patp) == 3:
-            return patp in suf
-
-        # Split patp
-        patp = patp.split("-")
-
-        # Check if valid
-        for p in patp:
-            if len(p) == 6:
-                if p[:3] not in pre:
-                    return False
-                if p[3:] not in suf:
-                    return False
-            else:
-                return False
-
-        return True
+        return Patp.valid(patp)
 
     def check_internet_access(addr):
         Log.log("Updater: Checking internet access")
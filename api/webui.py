@@ -3,6 +3,7 @@ import json
 
 # GroundSeg modules
 from log import Log
+from config_store import ConfigStore
 from webui_docker import WebUIDocker
 
 class WebUI:
@@ -68,6 +69,4 @@ class WebUI:
 
     # Save webui.json
     def save_config(self):
-        with open(self.filename,'w') as f:
-            json.dump(self.data, f, indent=4)
-            f.close()
+        return ConfigStore.save(self.filename, self.data)
@@ -1,17 +1,17 @@
 import sys
 import json
 import base64
-import requests
 import subprocess
 from time import sleep
 
 # GroundSeg modules
 from log import Log
+from config_store import ConfigStore
 from wireguard_docker import WireguardDocker
+from startram_client import StarTramClient
 
 class Wireguard:
 
-    _headers = {"Content-Type": "application/json"}
     data = {}
     updater_info = {}
     default_config = {
@@ -30,8 +30,10 @@ class Wireguard:
         self.config = config.config
         self.filename = f"{self.config_object.base_path}/settings/wireguard.json"
         self.anchor_data = {}
+        self.subdomains = {}
         self._volume_directory = f"{self.config['dockerData']}/volumes"
         self.wg_docker = WireguardDocker()
+        self.startram = StarTramClient()
 
         # Set Wireguard Config
         self.load_config()
@@ -209,9 +211,7 @@ class Wireguard:
 
     # Save wireguard.json
     def save_config(self):
-        with open(self.filename,'w') as f:
-            json.dump(self.data, f, indent=4)
-            f.close()
+        return ConfigStore.save(self.filename, self.data)
 
 #
 #   StarTram API
@@ -222,9 +222,7 @@ class Wireguard:
         Log.log("Anchor: Attempting to register device")
         try:
             update_data = {"reg_code" : f"{reg_key}","pubkey":self.config['pubkey']}
-            response = None
-
-            res = requests.post(f'{url}/register',json=update_data,headers=self._headers).json()
+            res = self.startram.post(url, 'register', update_data)
             Log.log(f"Anchor: /register response: {res}")
             if res['error'] != 0:
                 raise Exception("error not 0")
@@ -238,22 +236,54 @@ class Wireguard:
 
     # /v1/retrieve
     def get_status(self, url):
-        full_url = f"{url}/retrieve?pubkey={self.config['pubkey']}"
-        err_count = 0
-        while err_count < 6:
-            try:
-                self.anchor_data = requests.get(full_url,headers=self._headers).json()
-                return True
+        try:
+            self.anchor_data = self.startram.get(url, 'retrieve', {"pubkey": self.config['pubkey']}, retries=5)
+            self.index_subdomains()
+            return True
 
-            except Exception as e:
-                Log.log(f"Anchor: /retrieve failed: {e}")
-                t = err_count * 2
-                Log.log(f"Anchor: Attempting again in {t} seconds")
-                sleep(t)
-                err_count = err_count + 1
+        except Exception as e:
+            Log.log(f"Anchor: /retrieve failed: {e}")
 
         return False
 
+    # (patp, svc_type): subdomain entry, rebuilt on every /retrieve.
+    # Urls are [service labels.]patp.pub_url, the public url may have any number of labels
+    def index_subdomains(self):
+        pub_url = '.'.join(self.config['endpointUrl'].split('.')[1:])
+        index = {}
+        for ep in self.anchor_data.get('subdomains', []):
+            try:
+                url = ep['url']
+                if url.endswith(f".{pub_url}"):
+                    patp = url[:-len(pub_url) - 1].split('.')[-1]
+                    index[(patp, ep['svc_type'])] = ep
+            except Exception:
+                pass
+        self.subdomains = index
+
+    def service(self, patp, svc_type):
+        return self.subdomains.get((patp, svc_type))
+
+    def service_ready(self, patp, svc_type):
+        ep = self.service(patp, svc_type)
+        return ep != None and ep['status'] == 'ok'
+
+    # A ship's anchor endpoints, None until all of its services are ready
+    def ship_endpoints(self, patp):
+        svcs = ['urbit-web', 'urbit-ames', 'minio-bucket', 'minio-console']
+        if not all(self.service_ready(patp, s) for s in svcs):
+            return None
+
+        web = self.service(patp, 'urbit-web')
+        return {
+                "url": web['url'],
+                "http_port": web['port'],
+                "http_alias": web.get('alias'),
+                "ames_port": self.service(patp, 'urbit-ames')['port'],
+                "s3_port": self.service(patp, 'minio-bucket')['port'],
+                "console_port": self.service(patp, 'minio-console')['port']
+                }
+
     # /v1/create
     def register_service(self, subdomain, service_type, url):
         update_data = {
@@ -261,31 +291,28 @@ class Wireguard:
             "pubkey":self.config['pubkey'],
             "svc_type": service_type
         }
-        headers = {"Content-Type": "application/json"}
 
-        response = False
-        while not response:
-            try:
-                response = requests.post(f'{url}/create',json=update_data,headers=headers).json()
-                Log.log(f"Anchor: Sent creation request for {service_type}")
-            except Exception as e:
-                Log.log(f"Anchor: Failed to register service {service_type}: {e}")
-        
+        try:
+            response = self.startram.post(url, 'create', update_data, retries=5)
+            Log.log(f"Anchor: Sent creation request for {service_type}")
+        except Exception as e:
+            Log.log(f"Anchor: Failed to register service {service_type}: {e}")
+            return 'failed'
+
         # wait for it to be created
-        while response['status'] == 'creating':
+        while response.get('status') == 'creating':
             try:
-                response = requests.get(
-                        f'{url}/retrieve?pubkey={update_data["pubkey"]}',
-                        headers=headers).json()
+                response = self.startram.get(url, 'retrieve', {"pubkey": update_data["pubkey"]})
                 Log.log(f"Anchor: Retrieving response for {service_type}")
             except Exception as e:
                 Log.log(f"Anchor: Failed to retrieve response: {e}")
 
-            if(response['status'] == 'creating'):
+            # Also after a failed retrieve, so an outage can't spin
+            if response.get('status') == 'creating':
                 Log.log("Anchor: Waiting for endpoint to be created")
                 sleep(60)
 
-        return response['status']
+        return response.get('status')
 
     # /v1/create/alias
     def handle_alias(self, patp, alias, req_type):
@@ -293,8 +320,6 @@ class Wireguard:
         api_version = self.config['apiVersion']
         url = f"https://{endpoint}/{api_version}"
 
-        headers = {"Content-Type": "application/json"}
-
         blob = {
             "subdomain": patp,
             "alias": alias,
@@ -302,7 +327,7 @@ class Wireguard:
         }
         if req_type == 'post':
             try:
-                response = requests.post(f'{url}/create/alias',json=blob,headers=headers).json()
+                response = self.startram.post(url, 'create/alias', blob)
                 Log.log(f"Anchor: Sent alias {alias} creation request for {patp}")
                 Log.log(f"Anchor: {response}")
                 if response['error'] == 0:
@@ -312,7 +337,7 @@ class Wireguard:
 
         elif req_type == 'delete':
             try:
-                response = requests.delete(f'{url}/create/alias',json=blob,headers=headers).json()
+                response = self.startram.delete(url, 'create/alias', blob)
                 Log.log(f"Anchor: Sent alias {alias} deletion request for {patp}")
                 Log.log(f"Anchor: {response}")
                 if response['error'] == 0:
@@ -330,10 +355,9 @@ class Wireguard:
             "pubkey":self.config['pubkey'],
             "svc_type": service_type
         }
-        headers = {"Content-Type": "application/json"}
 
         try:
-            response = requests.post(f'{url}/delete',json=update_data,headers=headers).json()
+            response = self.startram.post(url, 'delete', update_data)
             Log.log(f"Anchor: Service {service_type} deleted: {response}")
         except Exception as e:
             Log.log(f"Anchor: Failed to delete service {service_type}")
@@ -342,12 +366,10 @@ class Wireguard:
     # /v1/stripe/cancel
     def cancel_subscription(self, reg_key, url):
         Log.log(f"Anchor: Attempting to cancel subscription")
-        headers = {"Content-Type": "application/json"}
         data = {'reg_code': reg_key}
-        response = None
 
         try:
-            response = requests.post(f'{url}/stripe/cancel',json=data,headers=headers).json()
+            response = self.startram.post(url, 'stripe/cancel', data)
             if response['error'] == 0:
                 if self.get_status(url):
                     Log.log(f"Anchor: Successfully canceled subscription")
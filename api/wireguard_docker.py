@@ -1,5 +1,6 @@
 import docker
 from log import Log
+from container_state import ContainerState
 
 client = docker.from_env()
 
@@ -34,6 +35,7 @@ class WireguardDocker:
 
         try:
             c.start()
+            ContainerState.set_status(name, "running")
             Log.log("Wireguard: Successfully started container")
             return True
         except:
@@ -50,6 +52,7 @@ class WireguardDocker:
             return False
         try:
             c.stop()
+            ContainerState.set_status(name, "exited")
             Log.log("Wireguard: Successfully stopped container")
             return True
         except:
@@ -85,10 +88,49 @@ class WireguardDocker:
 
 
     def is_running(self, name):
+        return ContainerState.is_running(name)
+
+
+    def exec(self, name, command):
+        c = self.get_container(name)
+        if c:
+            try:
+                return c.exec_run(command)
+            except Exception as e:
+                Log.log(f"Wireguard: Unable to exec {command}: {e}")
+
+        return False
+
+
+    # Restart in place, the container keeps its id
+    def restart(self, name):
+        Log.log("Wireguard: Attempting to restart container")
         c = self.get_container(name)
         if not c:
             return False
-        return c.status == "running"
+        try:
+            c.restart()
+            ContainerState.set_status(name, "running")
+            Log.log("Wireguard: Successfully restarted container")
+            return True
+        except Exception as e:
+            Log.log(f"Wireguard: Failed to restart container: {e}")
+            return False
+
+
+    # Running containers that share the wireguard network namespace
+    def dependents(self, name):
+        c = self.get_container(name)
+        if not c:
+            return []
+
+        modes = [f"container:{name}", f"container:{c.id}"]
+        try:
+            return [d for d in client.containers.list()
+                    if d.attrs['HostConfig'].get('NetworkMode') in modes]
+        except Exception as e:
+            Log.log(f"Wireguard: Unable to list dependent containers: {e}")
+            return []
 
 
     def remove_container(self, name):
@@ -0,0 +1,131 @@
+# Python
+import time
+from collections import deque
+
+# GroundSeg modules
+from log import Log
+
+class WireguardRecovery:
+
+    # Cheapest first, with the seconds each tier gets to bring the ships back
+    tiers = (("reload", 30), ("container", 120), ("rebuild", 300))
+
+    # Recovery attempts kept
+    history_size = 20
+
+    # Seconds between health checks while waiting on a tier
+    poll = 3
+
+    # Seconds before trying again after every tier failed, doubled per failed recovery
+    backoff_base = 60
+    backoff_max = 3600
+
+    # add_config writes wg0.conf to the volume mounted at /config
+    reload_cmd = ["sh", "-c", "wg-quick down /config/wg0.conf; wg-quick up /config/wg0.conf"]
+
+    def __init__(self, config, wireguard, urbit, minio):
+        self.config_object = config
+        self.config = config.config
+        self.wireguard = wireguard
+        self.urbit = urbit
+        self.minio = minio
+
+        # {"time", "tier", "recovered", "seconds"}
+        self.history = deque(maxlen=self.history_size)
+
+        # Recoveries in a row where every tier failed
+        self.failures = 0
+
+    # Escalates until healthy() passes, returns the tier that fixed it or None.
+    # The anchor is marked ready again either way so the refresher keeps checking
+    def recover(self, healthy):
+        Log.log("WG Recovery: Anchor connection is broken, starting recovery")
+        self.config_object.anchor_ready = False
+        try:
+            tier = self.escalate(healthy)
+        finally:
+            self.config_object.anchor_ready = True
+
+        if tier == None:
+            self.failures += 1
+            Log.log(f"WG Recovery: All recovery tiers failed, trying again in {self.backoff()}s")
+        else:
+            self.failures = 0
+        return tier
+
+    # Seconds the refresher waits after a failed recovery
+    def backoff(self):
+        return min(self.backoff_base * 2 ** max(self.failures - 1, 0), self.backoff_max)
+
+    def escalate(self, healthy):
+        for tier, timeout in self.tiers:
+            start = time.monotonic()
+            try:
+                done = getattr(self, tier)()
+            except Exception as e:
+                Log.log(f"WG Recovery: {tier} failed: {e}")
+                done = False
+
+            recovered = done and self.wait(healthy, start + timeout)
+            seconds = round(time.monotonic() - start, 1)
+            self.history.append({
+                "time": time.time(),
+                "tier": tier,
+                "recovered": recovered,
+                "seconds": seconds
+                })
+
+            if recovered:
+                Log.log(f"WG Recovery: Recovered by {tier} in {seconds}s")
+                return tier
+
+            Log.log(f"WG Recovery: {tier} did not recover the connection after {seconds}s")
+
+        return None
+
+    def wait(self, healthy, deadline):
+        while True:
+            try:
+                if healthy():
+                    return True
+            except Exception as e:
+                Log.log(f"WG Recovery: Health check failed: {e}")
+
+            if time.monotonic() + self.poll > deadline:
+                return False
+            time.sleep(self.poll)
+
+    # Fresh wg0.conf from the anchor, interface brought down and up in place
+    def reload(self):
+        endpoint = self.config['endpointUrl']
+        api_version = self.config['apiVersion']
+        if self.wireguard.get_status(f"https://{endpoint}/{api_version}"):
+            self.wireguard.update_wg_config(self.wireguard.anchor_data['conf'])
+
+        res = self.wireguard.wg_docker.exec(self.wireguard.data['wireguard_name'], self.reload_cmd)
+        if not res:
+            return False
+        if res.exit_code != 0:
+            Log.log(f"WG Recovery: Interface reload exited with {res.exit_code}: {res.output}")
+            return False
+        return True
+
+    # Restart the wireguard container, ships and minios in its namespace follow
+    def container(self):
+        name = self.wireguard.data['wireguard_name']
+        dependents = self.wireguard.wg_docker.dependents(name)
+        if not self.wireguard.wg_docker.restart(name):
+            return False
+
+        # They still hold the old namespace until they restart
+        for c in dependents:
+            try:
+                c.restart()
+            except Exception as e:
+                Log.log(f"WG Recovery: Failed to restart {c.name}: {e}")
+                return False
+        return True
+
+    # Last resort, every dependent is taken off the network and recreated
+    def rebuild(self):
+        return self.wireguard.restart(self.urbit, self.minio) == 200
@@ -1,11 +1,22 @@
 # Python
 import time
-import requests
 
 # GroundSeg modules
 from log import Log
+from health_probe import HealthProbe
+from wireguard_recovery import WireguardRecovery
 
 class WireguardRefresher:
+
+    # Seconds between probes of every ship
+    interval = 60
+
+    # Seconds before ships that got a 502 are probed again
+    recheck = 5
+
+    # Consecutive 502s from one ship before the anchor is called broken
+    threshold = 2
+
     def __init__(self, config, orchestrator):
         self.config_object = config
         self.config = config.config
@@ -13,44 +24,65 @@ class WireguardRefresher:
         self.wireguard = self.orchestrator.wireguard
         self.urbit = self.orchestrator.urbit
         self.minio = self.orchestrator.minio
-        self.failed = []
+        self.probe = HealthProbe()
+        self.recovery = WireguardRecovery(config, self.wireguard, self.urbit, self.minio)
+        self.orchestrator.wg_refresher = self
+
+        # Probes before this don't count towards a restart
+        self._since = 0
 
     # Checks if wireguard connection is functional, restarts wireguard
     def refresh_loop(self):
         Log.log("WG Refresher: Thread started")
-        count = 0
         while True:
-            if count > 1:
-                count = 0
-                self.failed = []
+            wait = self.interval
             try:
                 if self.config['wgOn'] and self.config_object.anchor_ready:
-                    copied = self.urbit._urbits
-                    for p in list(copied):
-                        running = False
-
-                        c = self.urbit.urb_docker.get_container(p)
-                        if c:
-                            running = c.status == "running"
-                        if running and copied[p]['network'] != "none":
-                            res = requests.get(f"https://{copied[p]['wg_url']}/~_~/healthz")
-                            if res.status_code == 502:
-                                if self.failure_check(p):
-                                    Log.log("WG Refresher: Anchor connection is broken. Restarting")
-                                    self.failed = []
-                                    self.wireguard.restart(self.urbit, self.minio)
-                                    break
-
+                    wait = self.refresh()
             except Exception as e:
                 Log.log(f"WG Refresher: {e}")
 
-            count += 1
-            time.sleep(60)
+            time.sleep(wait)
 
-    def failure_check(self, p):
-        if p in self.failed:
-            return True
-        else:
-            self.failed.append(p)
-            return False
+    # Probes remote ships, returns seconds until the next round
+    def refresh(self):
+        targets = self.targets()
+        self.probe.forget(set(p for p, _ in targets))
+        if len(targets) < 1:
+            return self.interval
 
+        res = self.probe.probe_all(targets)
+        failed = [p for p, status in res.items() if status == 502]
+        if len(failed) < 1:
+            return self.interval
+
+        broken = [p for p in failed if self.probe.streak(p, 502, self._since) >= self.threshold]
+        if len(broken) > 0:
+            Log.log(f"WG Refresher: Anchor connection is broken for {', '.join(broken)}")
+            urls = [t for t in targets if t[0] in broken]
+            tier = self.recovery.recover(lambda: self.healthy(urls))
+            self._since = time.time()
+            if tier == None:
+                return self.recovery.backoff()
+            return self.interval
+
+        # Confirm quickly instead of waiting a full interval
+        return self.recheck
+
+    # Every ship answers, and not with a 502 from the anchor
+    def healthy(self, targets):
+        res = self.probe.probe_all(targets)
+        return all(status not in (None, 502) for status in res.values())
+
+    # (patp, healthz url) of running ships on the anchor
+    def targets(self):
+        copied = self.urbit._urbits
+        targets = []
+        for p in list(copied):
+            try:
+                running = self.urbit.urb_docker.get_status(p) == "running"
+                if running and copied[p]['network'] != "none":
+                    targets.append((p, f"https://{copied[p]['wg_url']}/~_~/healthz"))
+            except Exception as e:
+                Log.log(f"WG Refresher: Unable to check {p}: {e}")
+        return targets
@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import shutil
+import tarfile
+import zipfile
+import argparse
+
+# Usage: python3 extract-bench.py [--sizes 1,2,5,10] [--formats tar.gz,zip] [--dir /tmp/extract-bench]
+#
+# Builds a synthetic pier of each size in GB, archives it, then times the
+# old single threaded extractall against the ParallelExtract paths pier imports use
+parser = argparse.ArgumentParser()
+parser.add_argument("--sizes", default="1,2,5,10", help="pier sizes in GB, fractions allowed")
+parser.add_argument("--formats", default="tar.gz,zip")
+parser.add_argument("--dir", default="/tmp/extract-bench")
+parser.add_argument("--keep", action="store_true", help="keep the archives between runs")
+args = parser.parse_args()
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+from extract_progress import ExtractProgress
+from parallel_extract import ParallelExtract
+from pier_stream import PierStream
+
+GB = 1024 ** 3
+MB = 1024 ** 2
+
+# Snapshot chunks, half random so compression behaves like a real pier,
+# plus a log directory of small event files
+def make_pier(root, size):
+    chk = os.path.join(root, "zod", ".urb", "chk")
+    log = os.path.join(root, "zod", ".urb", "log")
+    os.makedirs(chk, exist_ok=True)
+    os.makedirs(log, exist_ok=True)
+
+    small = min(size // 10, 256 * MB)
+    written = 0
+    i = 0
+    while written < small:
+        with open(os.path.join(log, f"{i}.dat"), "wb") as f:
+            f.write(os.urandom(32 * 1024))
+        written += 32 * 1024
+        i += 1
+
+    for name, share in (("north.bin", 0.6), ("south.bin", 0.4)):
+        left = int((size - written) * share)
+        with open(os.path.join(chk, name), "wb") as f:
+            while left > 0:
+                n = min(left, 64 * MB)
+                f.write(os.urandom(n // 2) + bytes(n - n // 2))
+                left -= n
+
+def make_archive(src, path, fmt):
+    if fmt == "zip":
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as z:
+            for root, _, files in os.walk(src):
+                for f in files:
+                    full = os.path.join(root, f)
+                    z.write(full, os.path.relpath(full, src))
+    else:
+        with tarfile.open(path, "w:gz", compresslevel=1) as t:
+            t.add(src, arcname=".")
+
+def old_extract(path, dest, fmt):
+    if fmt == "zip":
+        with zipfile.ZipFile(path) as z:
+            z.extractall(dest)
+    else:
+        with tarfile.open(path, "r:gz") as t:
+            t.extractall(dest)
+
+def new_extract(path, dest, fmt):
+    if fmt == "zip":
+        ParallelExtract.extract_zip(path, dest, ExtractProgress(os.path.getsize(path)))
+        return
+
+    # Same single pass extract_pier makes
+    stream = PierStream("zod", path, dest, os.path.getsize(path))
+    with open(path, "rb") as f:
+        offset = 0
+        while chunk := f.read(MB):
+            stream.write(offset, chunk)
+            offset += len(chunk)
+    err = stream.finish()
+    if err:
+        raise Exception(err)
+
+def timed(fn, *a):
+    start = time.time()
+    fn(*a)
+    return time.time() - start
+
+os.makedirs(args.dir, exist_ok=True)
+print(f"workers={ParallelExtract.workers()} pigz={'yes' if shutil.which('pigz') else 'no'}")
+print(f"{'size':>6} {'format':>7} {'archive':>9} {'old s':>8} {'new s':>8} {'old MB/s':>9} {'new MB/s':>9}")
+for size in [float(s) for s in args.sizes.split(",")]:
+    nbytes = int(size * GB)
+    pier = os.path.join(args.dir, f"pier-{size}")
+    if not os.path.isdir(pier):
+        make_pier(pier, nbytes)
+
+    for fmt in args.formats.split(","):
+        archive = os.path.join(args.dir, f"pier-{size}.{fmt}")
+        if not os.path.isfile(archive):
+            make_archive(pier, archive, fmt)
+
+        results = []
+        for fn in (old_extract, new_extract):
+            dest = os.path.join(args.dir, "out")
+            shutil.rmtree(dest, ignore_errors=True)
+            os.makedirs(dest)
+            os.system("sync")
+            results.append(timed(fn, archive, dest, fmt))
+            shutil.rmtree(dest, ignore_errors=True)
+
+        old, new = results
+        print(f"{size:>5}G {fmt:>7} {os.path.getsize(archive) / MB:>8.0f}M {old:>8.1f} {new:>8.1f} "
+              f"{nbytes / MB / old:>9.0f} {nbytes / MB / new:>9.0f}")
+
+        if not args.keep:
+            os.remove(archive)
+
+    if not args.keep:
+        shutil.rmtree(pier, ignore_errors=True)
@@ -0,0 +1,50 @@
+import sys
+import time
+import http.client
+from threading import Thread
+from urllib.parse import urlparse
+
+# Usage: python3 load-test.py http://groundseg.local:27016 <sessionid> [seconds]
+url = urlparse(sys.argv[1])
+sessionid = sys.argv[2]
+duration = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+paths = ["/urbits", "/system"]
+clients = [1, 5, 10, 25, 50]
+
+# One keep-alive connection per client, requests back to back
+def worker(path, deadline, results):
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    ok = 0
+    failed = 0
+    while time.time() < deadline:
+        try:
+            conn.request("GET", path, headers={"Cookie": f"sessionid={sessionid}"})
+            res = conn.getresponse()
+            res.read()
+            if res.status == 200:
+                ok += 1
+            else:
+                failed += 1
+        except Exception:
+            failed += 1
+            conn.close()
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    conn.close()
+    results.append((ok, failed))
+
+for path in paths:
+    for n in clients:
+        results = []
+        deadline = time.time() + duration
+        threads = [Thread(target=worker, args=(path, deadline, results)) for _ in range(n)]
+        began = time.time()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        taken = time.time() - began
+
+        ok = sum(r[0] for r in results)
+        failed = sum(r[1] for r in results)
+        print(f"{path:10} {n:3} clients  {ok / taken:8.1f} req/s  {failed} failed")
@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+from threading import Thread, Lock
+from datetime import datetime
+
+# Usage: python3 log-bench.py [--threads 1,4,16] [--lines 20000]
+#
+# Times Log.log callers against the old open, append and close per line,
+# both writing to a scratch directory instead of /opt/nativeplanet
+parser = argparse.ArgumentParser()
+parser.add_argument("--threads", default="1,4,16")
+parser.add_argument("--lines", type=int, default=20000, help="lines per run, split across threads")
+args = parser.parse_args()
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+from log import Log
+
+scratch = tempfile.mkdtemp(prefix="log-bench-")
+Log._log_dir = f"{scratch}/new"
+Log._legacy_log = f"{scratch}/groundseg.log"
+
+# Every caller opened, appended to and closed the monthly file itself
+old_lock = Lock()
+def old_log(text):
+    with old_lock:
+        os.makedirs(f"{scratch}/old", exist_ok=True)
+        with open(f"{scratch}/old/{datetime.now().strftime('%Y-%m')}.log", "a") as f:
+            f.write(f"{datetime.now()} {text}\n")
+
+def run(fn, threads, lines):
+    per = lines // threads
+    latencies = []
+
+    def worker(n):
+        worst = 0
+        for i in range(per):
+            start = time.perf_counter()
+            fn(f"bench: thread {n} line {i}")
+            worst = max(worst, time.perf_counter() - start)
+        latencies.append(worst)
+
+    start = time.perf_counter()
+    ts = [Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    returned = time.perf_counter() - start
+    if fn == Log.log:
+        Log.flush(60)
+    written = time.perf_counter() - start
+    return returned, written, max(latencies)
+
+# Both implementations echo to stderr, keep that out of the timings
+stderr = sys.stderr
+sys.stderr = open(os.devnull, "w")
+
+results = []
+for threads in [int(t) for t in args.threads.split(",")]:
+    for name, fn in (("old", old_log), ("new", Log.log)):
+        returned, written, worst = run(fn, threads, args.lines)
+        results.append((threads, name, returned, written, worst))
+
+sys.stderr = stderr
+print(f"{'threads':>7} {'impl':>4} {'lines/s':>9} {'written s':>9} {'worst call ms':>13}")
+for threads, name, returned, written, worst in results:
+    print(f"{threads:>7} {name:>4} {args.lines / returned:>9.0f} {written:>9.2f} {worst * 1000:>13.2f}")
+
+shutil.rmtree(scratch, ignore_errors=True)
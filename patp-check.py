@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+# Usage: python3 patp-check.py [--rounds 20000] [--seed 1]
+#
+# Checks api/patp.py against known @p values and random round trips,
+# then times Patp.valid against the check_patp it replaced
+parser = argparse.ArgumentParser()
+parser.add_argument("--rounds", type=int, default=20000, help="random values per bit width")
+parser.add_argument("--seed", type=int, default=None)
+args = parser.parse_args()
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+import patp
+from patp import Patp
+
+rng = random.Random(args.seed)
+
+def check(name, ok):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    return ok
+
+passed = True
+
+# Values from urbit-ob
+known = [
+        (0, "~zod"),
+        (255, "~fes"),
+        (256, "~marzod"),
+        (65535, "~fipfes"),
+        (65536, "~dapnep-ronmyl"),
+        (1624961343, "~sampel-palnet"),
+        (2 ** 32 - 1, "~dostec-risfen"),
+        (2 ** 64 - 1, "~fipfes-fipfes-dostec-risfen"),
+        ]
+for n, name in known:
+    passed &= check(f"{name} = {n}", Patp.from_int(n) == name and Patp.to_int(name) == n)
+
+# Names that are not @p
+for name in ("", "~", "~zodnec", "~sampel-palne", "~dozzod-dozzod", "~sampel--palnet-", None, 5):
+    passed &= check(f"{name!r} rejected", Patp.to_int(name) == None or not Patp.valid(name))
+
+# Random round trips from galaxies up to comets, valid only takes names up to
+# four words, the -- between longer names' blocks was never accepted
+for bits in (8, 16, 32, 48, 64, 96, 128):
+    bad = []
+    for _ in range(args.rounds):
+        n = rng.getrandbits(bits)
+        name = Patp.from_int(n)
+        if Patp.to_int(name) != n:
+            bad.append(n)
+        elif bits <= 64 and not name.startswith("~doz") and not Patp.valid(name):
+            bad.append(n)
+    passed &= check(f"{bits} bit round trips, {len(bad)} bad of {args.rounds}", len(bad) < 1)
+
+# check_patp before the syllable tables, rebuilt and searched on every call
+def old_valid(p):
+    if type(p) != str:
+        return False
+    if p.startswith("~"):
+        p = p[1:]
+    if p.startswith("doz"):
+        return False
+    pre = [patp._pre[i:i+3] for i in range(0, len(patp._pre), 3)]
+    suf = [patp._suf[i:i+3] for i in range(0, len(patp._suf), 3)]
+    if len(p) == 3:
+        return p in suf
+    for w in p.split("-"):
+        if len(w) != 6 or w[:3] not in pre or w[3:] not in suf:
+            return False
+    return True
+
+names = [Patp.from_int(rng.getrandbits(rng.choice((8, 16, 32, 64)))) for _ in range(args.rounds)]
+names += [n[:-1] + "x" for n in names[:args.rounds // 10]]
+passed &= check("valid matches the old check", all(old_valid(n) == Patp.valid(n) for n in names))
+
+def timed(fn, values):
+    start = time.perf_counter()
+    for v in values:
+        fn(v)
+    return (time.perf_counter() - start) / len(values) * 1000000
+
+ints = [rng.getrandbits(64) for _ in range(args.rounds)]
+print(f"{'call':>12} {'us':>8}")
+print(f"{'old valid':>12} {timed(old_valid, names):>8.2f}")
+print(f"{'valid':>12} {timed(Patp.valid, names):>8.2f}")
+print(f"{'from_int':>12} {timed(Patp.from_int, ints):>8.2f}")
+print(f"{'to_int':>12} {timed(Patp.to_int, names):>8.2f}")
+
+sys.exit(0 if passed else 1)
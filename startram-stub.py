@@ -0,0 +1,260 @@
+import ssl
+import sys
+import json
+import time
+import random
+import argparse
+from threading import Lock
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Offline stand-in for the StarTram API
+#
+# Usage: python3 startram-stub.py [--port 8089] [--fail-rate 0.3] [--delay 2] [--down 20] [--creating 2]
+#                                 [--endpoint api.startram.test:8089] [--cert cert.pem --key key.pem]
+#        python3 startram-stub.py --check
+#
+# --check runs the StarTram client in api/ against it and needs nothing else.
+#
+# GroundSeg itself always calls https://{endpointUrl}/{apiVersion} and checks the certificate,
+# so serving it takes more than the stub: a certificate for the --endpoint host that GroundSeg
+# trusts (REQUESTS_CA_BUNDLE), that host resolving to 127.0.0.1, and endpointUrl set to the same
+# --endpoint with apiVersion v1. Service urls are built from --endpoint the way StarTram does
+parser = argparse.ArgumentParser()
+parser.add_argument("--port", type=int, default=8089)
+parser.add_argument("--fail-rate", type=float, default=0, help="share of requests answered with a 503")
+parser.add_argument("--delay", type=float, default=0, help="seconds added to every response")
+parser.add_argument("--down", type=float, default=0, help="answer everything with a 503 for the first n seconds")
+parser.add_argument("--creating", type=int, default=1, help="retrieves a new service stays in creating")
+parser.add_argument("--endpoint", default=None, help="endpointUrl GroundSeg is given, defaults to api.startram.test:port")
+parser.add_argument("--cert", default=None, help="certificate to serve https with")
+parser.add_argument("--key", default=None, help="key of --cert")
+parser.add_argument("--check", action="store_true", help="run the client checks and exit")
+args = parser.parse_args()
+
+endpoint = args.endpoint or f"api.startram.test:{args.port}"
+
+# Service urls end with endpointUrl minus its first label, GroundSeg reads the ship from the label before it
+pub_url = '.'.join(endpoint.split('.')[1:])
+prefixes = {
+        "urbit-web": "",
+        "urbit-ames": "ames.",
+        "minio": "",
+        "minio-console": "console.",
+        "minio-bucket": "bucket."
+        }
+
+state = {"started": time.time(), "subdomains": {}, "calls": 0}
+lock = Lock()
+
+def retrieve(pubkey):
+    subdomains = []
+    with lock:
+        for sub in state['subdomains'].values():
+            if sub['status'] == 'creating':
+                sub['polls'] -= 1
+                if sub['polls'] < 0:
+                    sub['status'] = 'ok'
+            subdomains.append({k: v for k, v in sub.items() if k != 'polls'})
+
+    creating = any(s['status'] == 'creating' for s in subdomains)
+    return {
+            "error": 0,
+            "status": "creating" if creating else "ok",
+            "conf": "W0ludGVyZmFjZV0K",
+            "lease": "2030-01-01",
+            "ongoing": 0,
+            "pubkey": pubkey,
+            "subdomains": subdomains
+            }
+
+def create(blob):
+    svcs = {"urbit": ["urbit-web", "urbit-ames"], "minio": ["minio", "minio-console", "minio-bucket"]}
+    with lock:
+        for svc in svcs.get(blob.get('svc_type'), []):
+            port = 30000 + len(state['subdomains'])
+            state['subdomains'][(blob['subdomain'], svc)] = {
+                    "url": f"{prefixes[svc]}{blob['subdomain']}.{pub_url}",
+                    "svc_type": svc,
+                    "port": port,
+                    "alias": None,
+                    "status": "creating",
+                    "polls": args.creating
+                    }
+    return {"error": 0, "status": "creating"}
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.handle_api("GET")
+
+    def do_POST(self):
+        self.handle_api("POST")
+
+    def do_DELETE(self):
+        self.handle_api("DELETE")
+
+    def handle_api(self, method):
+        with lock:
+            state['calls'] += 1
+
+        if args.delay > 0:
+            time.sleep(args.delay)
+
+        if time.time() - state['started'] < args.down or random.random() < args.fail_rate:
+            return self.reply(503, {"error": 1, "reason": "unavailable"})
+
+        url = urlparse(self.path)
+        endpoint = url.path.split("/", 2)[-1]
+        length = int(self.headers.get("Content-Length") or 0)
+        blob = json.loads(self.rfile.read(length) or b"{}")
+
+        if method == "GET" and endpoint == "retrieve":
+            pubkey = parse_qs(url.query).get("pubkey", [""])[0]
+            return self.reply(200, retrieve(pubkey))
+
+        if method == "POST" and endpoint == "create":
+            return self.reply(200, create(blob))
+
+        if endpoint == "create/alias" and method in ("POST", "DELETE"):
+            with lock:
+                for (sub, svc), s in state['subdomains'].items():
+                    if sub == blob.get('subdomain') and svc in ("urbit-web", "minio"):
+                        s['alias'] = blob.get('alias') if method == "POST" else None
+            return self.reply(200, {"error": 0})
+
+        if method == "POST" and endpoint in ("register", "delete", "stripe/cancel"):
+            if endpoint == "delete":
+                with lock:
+                    for key in [k for k in state['subdomains'] if k[0] == blob.get('subdomain')]:
+                        state['subdomains'].pop(key)
+            return self.reply(200, {"error": 0})
+
+        self.reply(404, {"error": 1, "reason": "not found"})
+
+    def reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *a):
+        pass
+
+server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+scheme = "http"
+if args.cert:
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(args.cert, args.key)
+    server.socket = ctx.wrap_socket(server.socket, server_side=True)
+    scheme = "https"
+
+if not args.check:
+    print(f"StarTram stub listening on {scheme}://127.0.0.1:{args.port}, service urls end with .{pub_url}")
+    server.serve_forever()
+
+# Client checks against the stub, no anchor or docker needed
+from threading import Thread
+sys.path.insert(0, "api")
+from startram_client import StarTramClient, StarTramError
+
+Thread(target=server.serve_forever, daemon=True).start()
+url = f"{scheme}://127.0.0.1:{args.port}/v1"
+StarTramClient.backoff_base = 0.05
+StarTramClient.breaker_cooldown = 1
+
+def check(name, ok):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}")
+    return ok
+
+passed = True
+
+# Retries ride out a flaky server
+args.fail_rate = 0.3
+client = StarTramClient()
+res = [client.get(url, "retrieve", {"pubkey": "x"}, retries=8)['error'] for _ in range(20)]
+m = client.metrics()['endpoints']['retrieve']
+passed &= check(f"flaky server, {m['retries']} retries", res == [0] * 20)
+
+# Register isn't sent twice after StarTram answered with an error
+args.fail_rate = 1
+client = StarTramClient()
+calls = state['calls']
+try:
+    client.post(url, "register", {"reg_code": "x", "pubkey": "x"}, retries=3)
+except StarTramError:
+    pass
+passed &= check("register not retried after a 503", state['calls'] == calls + 1)
+
+# but is when the connection was never made
+closed = StarTramClient()
+try:
+    closed.post("http://127.0.0.1:1/v1", "register", {"reg_code": "x", "pubkey": "x"}, retries=2)
+except StarTramError:
+    pass
+passed &= check("register retried when refused", closed.metrics()['endpoints']['register']['retries'] == 2)
+
+# One call's own retries count as a single failure
+try:
+    client.get(url, "retrieve", {"pubkey": "x"}, retries=StarTramClient.breaker_threshold + 1)
+except StarTramError:
+    pass
+passed &= check("retries don't open the circuit", client.metrics()['circuit'] == "closed")
+
+# Circuit opens after repeated failed calls to one endpoint and fails fast while open
+for _ in range(StarTramClient.breaker_threshold - 1):
+    try:
+        client.get(url, "retrieve", {"pubkey": "x"}, retries=0)
+    except StarTramError:
+        pass
+calls = state['calls']
+start = time.time()
+try:
+    client.get(url, "retrieve", {"pubkey": "x"})
+except StarTramError:
+    pass
+passed &= check("open circuit fails fast", state['calls'] == calls and time.time() - start < 0.1)
+passed &= check("circuit reported open", client.metrics()['circuit'] == "open")
+
+# Other endpoints still get through
+try:
+    client.post(url, "delete", {"subdomain": "x"}, retries=0)
+except StarTramError:
+    pass
+passed &= check("other endpoints unaffected", state['calls'] == calls + 1
+                and client.metrics()['endpoints']['delete']['circuit'] == "closed")
+
+# Half open after the cooldown, one success closes it
+args.fail_rate = 0
+time.sleep(StarTramClient.breaker_cooldown)
+res = client.get(url, "retrieve", {"pubkey": "x"})
+passed &= check("circuit closes after cooldown", res['error'] == 0 and client.metrics()['circuit'] == "closed")
+
+# Service creation polls until ready
+client.post(url, "create", {"subdomain": "zod", "pubkey": "x", "svc_type": "urbit"})
+client.post(url, "create", {"subdomain": "s3.zod", "pubkey": "x", "svc_type": "minio"})
+polls = 0
+while client.get(url, "retrieve", {"pubkey": "x"})['status'] == "creating":
+    polls += 1
+passed &= check(f"service ready after {polls} polls", polls == args.creating)
+
+# Urls carry the ship where Wireguard.index_subdomains looks for it
+subs = client.get(url, "retrieve", {"pubkey": "x"})['subdomains']
+ships = set(s['url'][:-len(pub_url) - 1].split('.')[-1] for s in subs if s['url'].endswith(f".{pub_url}"))
+passed &= check(f"{len(subs)} service urls under .{pub_url}", len(subs) == 5 and ships == {"zod"})
+
+# Timeouts are enforced
+args.delay = 1
+StarTramClient.timeouts = {"retrieve": (1, 0.2)}
+client = StarTramClient()
+start = time.time()
+try:
+    client.get(url, "retrieve", {"pubkey": "x"}, retries=0)
+    timed_out = False
+except StarTramError:
+    timed_out = True
+passed &= check("read timeout", timed_out and time.time() - start < 0.9)
+
+print(json.dumps(client.metrics(), indent=2))
+sys.exit(0 if passed else 1)
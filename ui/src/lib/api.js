@@ -19,6 +19,10 @@ export const api = writable('')
 export const isPortrait = writable(false)
 export const currentLog = writable({'container': '', 'log': []})
 export const power = writable('')
+export const exportCodec = writable('deflate')
+export const anchor = writable({})
+export const ships = writable(null) // ship details by patp, null until /events sends them
+export const uploads = writable({}) // pier upload status by patp
 
 //
 // state update
@@ -27,11 +31,117 @@ export const updateState = update => {
   updateConnStatus(update['status'])
 	updateUrbits(update['urbits'])
   updateSystemInformation(update['system'])
+  updateAnchor(update['anchor'])
 }
 
 const updateConnStatus = c => noconn.set(c == 'noconn')
 const updateUrbits = p => {if (p) {urbits.set(p)}}
 const updateSystemInformation = s => {if (s) {system.set(s)}}
+const updateAnchor = a => {if (a) {anchor.set(a)}}
+
+//
+// live state
+//
+
+// Stores filled by each /events topic
+const topics = {
+  'urbits': s => urbits.set(Object.values(s)),
+  'urbit': s => ships.set(s),
+  'system': s => system.set(s),
+  'anchor': s => anchor.set(s),
+  'upload': s => uploads.set(s)
+}
+
+let events = null
+let live = {}
+
+// Follows /events, the server sends every topic in full on connect
+// and only the changed keys after that
+export const followEvents = url => {
+  if (events) { return }
+  events = new EventSource(url + '/events', {withCredentials: true})
+
+  events.onopen = () => {
+    live = {}
+    noconn.set(false)
+  }
+
+  events.onerror = () => {
+    if (events.readyState != EventSource.CLOSED) {
+      // Dropped, the browser reconnects by itself
+      noconn.set(true)
+      return
+    }
+
+    // Refused, either the session is gone or every stream slot is taken
+    events = null
+    fetch(url + '/cookies', {credentials: 'include'})
+      .then(r => r.json())
+      .then(r => {
+        if (r == 404) { window.location.href = '/login' }
+        else { setTimeout(() => followEvents(url), 10000) }
+      })
+      .catch(() => {
+        noconn.set(true)
+        setTimeout(() => followEvents(url), 2000)
+      })
+  }
+
+  Object.keys(topics).forEach(t => events.addEventListener(t, e => {
+    let diff = JSON.parse(e.data)
+    let s = Object.assign({}, live[t], diff.set)
+    diff.unset.forEach(k => delete s[k])
+    live[t] = s
+    topics[t](s)
+  }))
+}
+
+//
+// background jobs
+//
+
+// Resolves with a job's result, polling /jobs until it has finished
+export const awaitJob = (url, res) => new Promise((resolve, reject) => {
+  if (!res || !res.job) { return resolve(res) }
+  const poll = () => {
+    fetch(url + '/jobs?id=' + res.job, {credentials: 'include'})
+      .then(r => r.json())
+      .then(j => {
+        if (j.status == 'done' || j.status == 'failed') { resolve(j.result) }
+        else if (j == 400 || j == 404) { resolve(j) }
+        else { setTimeout(poll, 1000) }
+      })
+      .catch(reject)
+  }
+  poll()
+})
+
+//
+// exports
+//
+
+// Archive formats the export route can write
+export const exportCodecs = [
+  {'codec':'deflate', 'label':'zip'},
+  {'codec':'store', 'label':'zip (uncompressed)'},
+  {'codec':'zstd', 'label':'tar.zst'}
+]
+
+// Checks the export can start, then hands the streaming download to the browser.
+// Resolves false if the server refused it
+export const downloadExport = (url, name, app, codec) => {
+  const href = url + '/urbit/export?urbit_id=' + name + '&app=' + app + '&codec=' + codec
+  return fetch(href, {method: 'HEAD', credentials: 'include'})
+    .then(r => {
+      if (!r.ok) { return false }
+      var a = document.createElement("a")
+      a.href = href
+      a.download = (app == 'minio' ? 'bucket_' : '') + name
+      a.click()
+      return true
+    })
+    .catch(() => false)
+}
 
 //
 // misc